@@ -1,13 +1,32 @@
+import java.io.BufferedReader;
+import java.io.BufferedWriter;
 import java.io.File;
 import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
 import java.util.Optional;
+import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.TimeUnit;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
 
 import edu.mit.csail.sdg.alloy4whole.ExampleUsingTheCompiler;
 import edu.mit.csail.sdg.alloy4.Err;
+import edu.mit.csail.sdg.alloy4.ErrorFatal;
 import edu.mit.csail.sdg.parser.CompModule;
 import edu.mit.csail.sdg.parser.CompUtil;
 import edu.mit.csail.sdg.ast.Func;
 import edu.mit.csail.sdg.ast.Command;
+import edu.mit.csail.sdg.ast.Sig;
 import edu.mit.csail.sdg.sim.SimInstance;
 import edu.mit.csail.sdg.translator.TranslateAlloyToKodkod;
 import edu.mit.csail.sdg.translator.A4Options;
@@ -20,55 +39,735 @@ import edu.mit.csail.sdg.alloy4.A4Preferences.ChoicePref;
 import edu.mit.csail.sdg.alloy4.WorkerEngine;
 
 public class AlloyRunner {
+    // Printed after every response in server mode so clients know when to stop reading
+    static final String END_OF_RESPONSE = "--- end of response ---";
+
+    // Prefix of the structured line printed for every model in batch mode
+    static final String RESULT_PREFIX = "Result: ";
+
+    static final String USAGE =
+        "Usage: java AlloyRunner [--warmup <n>] [--iterations <n>] [--command <label>]\n" +
+        "                        [--scope <sig>=<n>] [--exact-scope <sig>=<n>]\n" +
+        "                        [--solver <id> | --portfolio <id>,<id>,...]\n" +
+        "                        [--portfolio-grace <ms>] <alloy_file>\n" +
+        "       java AlloyRunner --server\n" +
+        "       java AlloyRunner --batch <manifest>";
+
+    // Scope of one sig, set on the command instead of editing the model
+    static class Scope {
+        String sig;
+        boolean exact;
+        int size;
+
+        static Scope parse(String text, boolean exact) {
+            String[] parts = text.split("=", 2);
+            if (parts.length != 2) {
+                throw new IllegalArgumentException("expected <sig>=<n>, got '" + text + "'");
+            }
+            Scope scope = new Scope();
+            scope.sig = parts[0];
+            scope.exact = exact;
+            try {
+                scope.size = Integer.parseInt(parts[1]);
+            } catch (NumberFormatException e) {
+                throw new IllegalArgumentException("invalid scope '" + text + "'");
+            }
+            return scope;
+        }
+    }
+
+    // Options of a single solve, given on the command line or in a server request
+    static class RunOptions {
+        String file;
+        int warmup = 4;
+        int iterations = 1;
+        // Label of the command to run, the last command if null
+        String command;
+        // Solver id, or null for the historical default
+        String solver;
+        // Solvers raced against each other, or null to use solver alone
+        List<String> portfolio;
+        // How long portfolio losers may still take after the winner answered
+        // before their processes are killed and restarted
+        long portfolioGraceMs = 1000;
+        // Sig scopes overriding those of the command, in order
+        List<Scope> scopes = new ArrayList<>();
+
+        static RunOptions parse(String[] args, int from) {
+            RunOptions options = new RunOptions();
+            for (int i = from; i < args.length; i++) {
+                if (args[i].equals("--warmup") && i + 1 < args.length) {
+                    options.warmup = Integer.parseInt(args[++i]);
+                } else if (args[i].equals("--iterations") && i + 1 < args.length) {
+                    options.iterations = Integer.parseInt(args[++i]);
+                } else if (args[i].equals("--command") && i + 1 < args.length) {
+                    options.command = args[++i];
+                } else if (args[i].equals("--solver") && i + 1 < args.length) {
+                    options.solver = args[++i];
+                } else if (args[i].equals("--portfolio") && i + 1 < args.length) {
+                    options.portfolio = Arrays.asList(args[++i].split(","));
+                } else if (args[i].equals("--portfolio-grace") && i + 1 < args.length) {
+                    options.portfolioGraceMs = Long.parseLong(args[++i]);
+                } else if (args[i].equals("--scope") && i + 1 < args.length) {
+                    options.scopes.add(Scope.parse(args[++i], false));
+                } else if (args[i].equals("--exact-scope") && i + 1 < args.length) {
+                    options.scopes.add(Scope.parse(args[++i], true));
+                } else if (args[i].startsWith("--")) {
+                    throw new IllegalArgumentException("unknown option '" + args[i] + "'");
+                } else {
+                    options.file = args[i];
+                }
+            }
+            if (options.file == null) {
+                throw new IllegalArgumentException("missing alloy file");
+            }
+            if (options.warmup < 0 || options.iterations < 1) {
+                throw new IllegalArgumentException("need --warmup >= 0 and --iterations >= 1");
+            }
+            if (options.portfolioGraceMs < 0) {
+                throw new IllegalArgumentException("need --portfolio-grace >= 0");
+            }
+            // Fail on unknown solver ids before anything is solved
+            options.solvers();
+            return options;
+        }
+
+        List<SatSolver> solvers() {
+            List<SatSolver> solvers = new ArrayList<>();
+            if (portfolio != null) {
+                for (String id : portfolio) {
+                    solvers.add(findSolver(id));
+                }
+            } else if (solver != null) {
+                solvers.add(findSolver(solver));
+            } else {
+                // What this runner always used; parse() falls back to SAT4J
+                // when no solver has this id
+                solvers.add(SatSolver.parse("nuXmv"));
+            }
+            return solvers;
+        }
+    }
+
+    // Outcome of one solve, printed as one JSON line in batch mode
+    static class SolveResult {
+        int line;
+        String file;
+        String command;
+        List<Long> iterations = new ArrayList<>();
+        // Translation and solving part of each measured iteration
+        List<Long> translations = new ArrayList<>();
+        List<Long> solvings = new ArrayList<>();
+        // Solver that produced each measured iteration, the winner of a portfolio race
+        List<String> solvers = new ArrayList<>();
+        long mean = -1;
+        Boolean satisfiable;
+        String error;
+
+        String toJson() {
+            return "{\"line\": " + line
+                + ", \"file\": " + quote(file)
+                + ", \"command\": " + quote(command)
+                + ", \"iterations_ms\": [" + join(iterations) + "]"
+                + ", \"translation_ms\": [" + join(translations) + "]"
+                + ", \"solving_ms\": [" + join(solvings) + "]"
+                + ", \"solvers\": [" + String.join(", ", solvers.stream().map(SolveResult::quote).toArray(String[]::new)) + "]"
+                + ", \"mean_ms\": " + (mean < 0 ? "null" : Long.toString(mean))
+                + ", \"satisfiable\": " + satisfiable
+                + ", \"error\": " + quote(error) + "}";
+        }
+
+        static String join(List<Long> times) {
+            StringBuilder out = new StringBuilder();
+            for (Long time : times) {
+                if (out.length() > 0) {
+                    out.append(", ");
+                }
+                out.append(time);
+            }
+            return out.toString();
+        }
+
+        static String quote(String s) {
+            if (s == null) {
+                return "null";
+            }
+            StringBuilder out = new StringBuilder("\"");
+            for (char c : s.toCharArray()) {
+                if (c == '"' || c == '\\') {
+                    out.append('\\').append(c);
+                } else if (c < 0x20) {
+                    out.append(String.format("\\u%04x", (int) c));
+                } else {
+                    out.append(c);
+                }
+            }
+            return out.append('"').toString();
+        }
+    }
+
+    // Records when translation to SAT is done, i.e. when the solver is first invoked
+    static class TimingReporter extends A4Reporter {
+        long translatedAt = -1;
+
+        @Override
+        public void solve(int plength, int primaryVars, int totalVars, int clauses) {
+            if (translatedAt < 0) {
+                translatedAt = System.nanoTime();
+            }
+        }
+    }
+
+    // One execution of a command: whether it was satisfiable, who solved it,
+    // when it started if not when it was called, when translation ended and
+    // when the answer was found
+    static class Execution {
+        boolean satisfiable;
+        String solver;
+        long startedAt = -1;
+        long translatedAt = -1;
+        long finishedAt = -1;
+    }
+
+    static SatSolver findSolver(String id) {
+        List<String> ids = new ArrayList<>();
+        for (SatSolver solver : SatSolver.values()) {
+            if (solver.id().equalsIgnoreCase(id) || solver.toString().equalsIgnoreCase(id)) {
+                return solver;
+            }
+            ids.add(solver.id());
+        }
+        throw new IllegalArgumentException("unknown solver '" + id + "', available: " + String.join(", ", ids));
+    }
+
+    static Execution execute(CompModule world, Command command, SatSolver solver) throws Err {
+        TimingReporter timer = new TimingReporter();
+        A4Options options = new A4Options();
+        options.solver = solver;
+
+        Execution execution = new Execution();
+        A4Solution solution = TranslateAlloyToKodkod.execute_command(timer, world.getAllReachableSigs(), command, options);
+        execution.finishedAt = System.nanoTime();
+        execution.satisfiable = solution.satisfiable();
+        execution.solver = solver.id();
+        execution.translatedAt = timer.translatedAt;
+        return execution;
+    }
+
+    // What a portfolio member printed for one request, or for the request
+    // it died in
+    static class Response {
+        Member member;
+        Process process;
+        long number;
+        List<String> lines;
+        long receivedAt;
+        boolean died;
+    }
+
+    // Responses of every portfolio member, in the order they arrived
+    static final BlockingQueue<Response> RESPONSES = new LinkedBlockingQueue<>();
+
+    static final Pattern ITERATION_LINE = Pattern.compile(
+        "Iteration 1/1: translation (\\d+)ms, solving (\\d+)ms, total (\\d+)ms");
+
+    // A portfolio member: an AlloyRunner server in a JVM of its own that
+    // solves with one solver. It parses and caches its own copy of every
+    // model, and a loser still busy in native SAT code can be killed.
+    static class Member {
+        final String solver;
+        Process process;
+        BufferedWriter in;
+        long sent;
+
+        Member(String solver) throws IOException {
+            this.solver = solver;
+            start();
+        }
+
+        void start() throws IOException {
+            process = new ProcessBuilder(memberCommand()).redirectErrorStream(true).start();
+            in = new BufferedWriter(new OutputStreamWriter(process.getOutputStream()));
+            sent = 0;
+            Process started = process;
+            Thread reader = new Thread(() -> pump(started));
+            reader.setDaemon(true);
+            reader.start();
+        }
+
+        // Runs in the reader thread of one process of this member
+        void pump(Process started) {
+            long answered = 0;
+            List<String> lines = new ArrayList<>();
+            try (BufferedReader out = new BufferedReader(new InputStreamReader(started.getInputStream()))) {
+                String line;
+                while ((line = out.readLine()) != null) {
+                    if (line.equals(END_OF_RESPONSE)) {
+                        RESPONSES.add(response(started, ++answered, lines, false));
+                        lines = new ArrayList<>();
+                    } else {
+                        lines.add(line);
+                    }
+                }
+            } catch (IOException e) {
+                // The process was killed
+            }
+            RESPONSES.add(response(started, answered + 1, lines, true));
+        }
+
+        Response response(Process started, long number, List<String> lines, boolean died) {
+            Response response = new Response();
+            response.member = this;
+            response.process = started;
+            response.number = number;
+            response.lines = lines;
+            response.receivedAt = System.nanoTime();
+            response.died = died;
+            return response;
+        }
+
+        // Send one request and return its number, which its response carries
+        long send(List<String> request) throws IOException {
+            in.write(String.join("\t", request));
+            in.newLine();
+            in.flush();
+            return ++sent;
+        }
+
+        boolean answers(Response response, long number) {
+            return response.member == this && response.process == process && response.number == number;
+        }
+
+        void kill() {
+            process.descendants().forEach(ProcessHandle::destroyForcibly);
+            process.destroyForcibly();
+            try {
+                process.waitFor(10, TimeUnit.SECONDS);
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+            }
+        }
+    }
+
+    // Portfolio members of this JVM by solver id, kept across solves so
+    // their JIT stays warm and their models stay parsed
+    static final Map<String, Member> MEMBERS = new LinkedHashMap<>();
+
+    static {
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> {
+            for (Member member : MEMBERS.values()) {
+                member.kill();
+            }
+        }));
+    }
+
+    // This JVM's launch command with the program arguments replaced by
+    // --server, so members run the same Alloy jar and runner source
+    static List<String> memberCommand() {
+        ProcessHandle.Info info = ProcessHandle.current().info();
+        Optional<String[]> arguments = info.arguments();
+        if (info.command().isPresent() && arguments.isPresent()) {
+            List<String> command = new ArrayList<>();
+            command.add(info.command().get());
+            for (String argument : arguments.get()) {
+                command.add(argument);
+                if (argument.endsWith("AlloyRunner.java") || argument.equals("AlloyRunner")) {
+                    command.add("--server");
+                    return command;
+                }
+            }
+        }
+        String java = Paths.get(System.getProperty("java.home"), "bin", "java").toString();
+        return Arrays.asList(java, "-cp", System.getProperty("java.class.path"), "AlloyRunner", "--server");
+    }
+
+    static Response nextResponse(long timeoutNanos) throws Err {
+        try {
+            if (timeoutNanos < 0) {
+                return RESPONSES.take();
+            }
+            return RESPONSES.poll(timeoutNanos, TimeUnit.NANOSECONDS);
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new ErrorFatal("portfolio race interrupted");
+        }
+    }
+
+    // Have members parse a model and wait until they did, so that the
+    // parse of a new or restarted member is not part of a timed race
+    static void prepare(List<Member> members, String file) throws Err {
+        Map<Member, Long> pending = new HashMap<>();
+        try {
+            for (Member member : members) {
+                pending.put(member, member.send(Arrays.asList("parse", file)));
+            }
+        } catch (IOException e) {
+            throw new ErrorFatal("cannot start portfolio member: " + e.getMessage());
+        }
+        while (!pending.isEmpty()) {
+            Response response = nextResponse(-1);
+            Long number = pending.get(response.member);
+            if (number != null && response.member.answers(response, number)) {
+                pending.remove(response.member);
+            }
+        }
+    }
+
+    static List<String> memberRequest(RunOptions options, String solver, String file) {
+        List<String> request = new ArrayList<>(Arrays.asList(
+            "solve", "--solver", solver, "--warmup", "0", "--iterations", "1"));
+        if (options.command != null) {
+            request.add("--command");
+            request.add(options.command);
+        }
+        for (Scope scope : options.scopes) {
+            request.add(scope.exact ? "--exact-scope" : "--scope");
+            request.add(scope.sig + "=" + scope.size);
+        }
+        request.add(file);
+        return request;
+    }
+
+    // The execution a member reported, or null if it did not solve
+    static Execution memberExecution(Response response, long sentAt) {
+        if (response.died) {
+            return null;
+        }
+        for (String line : response.lines) {
+            Matcher match = ITERATION_LINE.matcher(line);
+            if (match.find()) {
+                Execution execution = new Execution();
+                execution.solver = response.member.solver;
+                execution.startedAt = sentAt;
+                execution.translatedAt = sentAt + Long.parseLong(match.group(1)) * 1_000_000;
+                execution.finishedAt = response.receivedAt;
+                execution.satisfiable = response.lines.contains("Instance found. Predicate is consistent.");
+                return execution;
+            }
+        }
+        return null;
+    }
+
+    // Run the command once with every solver of the portfolio, each in its
+    // own member process, and return the first answer. Losers get
+    // --portfolio-grace to finish; members still solving then are killed
+    // and restarted, so no solver outlives the race and competes with the
+    // next execution for CPU, and a hanging solver cannot stall the run.
+    static Execution race(RunOptions options, List<SatSolver> solvers) throws Err {
+        String file = new File(options.file).getAbsolutePath();
+        List<Member> members = new ArrayList<>();
+        List<Member> started = new ArrayList<>();
+        try {
+            for (SatSolver solver : solvers) {
+                Member member = MEMBERS.get(solver.id());
+                if (member == null) {
+                    member = new Member(solver.id());
+                    MEMBERS.put(solver.id(), member);
+                    started.add(member);
+                }
+                members.add(member);
+            }
+        } catch (IOException e) {
+            throw new ErrorFatal("cannot start portfolio member: " + e.getMessage());
+        }
+        prepare(started, file);
+
+        Map<Member, Long> pending = new HashMap<>();
+        long sentAt = System.nanoTime();
+        try {
+            for (Member member : members) {
+                pending.put(member, member.send(memberRequest(options, member.solver, file)));
+            }
+        } catch (IOException e) {
+            throw new ErrorFatal("portfolio member failed: " + e.getMessage());
+        }
+
+        Execution winner = null;
+        List<String> errors = new ArrayList<>();
+        while (winner == null && !pending.isEmpty()) {
+            Response response = nextResponse(-1);
+            Long number = pending.get(response.member);
+            if (number == null || !response.member.answers(response, number)) {
+                continue;
+            }
+            pending.remove(response.member);
+            winner = memberExecution(response, sentAt);
+            if (winner == null) {
+                String last = response.lines.isEmpty() ? "no output" : response.lines.get(response.lines.size() - 1);
+                errors.add(response.member.solver + (response.died ? " died: " : ": ") + last);
+            }
+        }
+
+        // Give the losers a bounded time to finish, then replace the rest
+        long deadline = System.nanoTime() + options.portfolioGraceMs * 1_000_000;
+        while (!pending.isEmpty()) {
+            Response response = nextResponse(Math.max(0, deadline - System.nanoTime()));
+            if (response == null) {
+                break;
+            }
+            Long number = pending.get(response.member);
+            if (number != null && response.member.answers(response, number)) {
+                pending.remove(response.member);
+            }
+        }
+        List<Member> restarted = new ArrayList<>(pending.keySet());
+        for (Member loser : restarted) {
+            System.out.println("Restarting portfolio member " + loser.solver + ", still solving after "
+                + options.portfolioGraceMs + "ms grace");
+            loser.kill();
+            try {
+                loser.start();
+            } catch (IOException e) {
+                MEMBERS.remove(loser.solver);
+                throw new ErrorFatal("cannot restart portfolio member: " + e.getMessage());
+            }
+        }
+        prepare(restarted, file);
+
+        if (winner == null) {
+            throw new ErrorFatal("all portfolio solvers failed: " + String.join("; ", errors));
+        }
+        return winner;
+    }
+
+    static Execution execute(CompModule world, Command command, RunOptions options, List<SatSolver> solvers) throws Err {
+        if (solvers.size() > 1) {
+            return race(options, solvers);
+        }
+        return execute(world, command, solvers.get(0));
+    }
+
     public static void main(String[] args) {
         try {
             if (args.length < 1) {
-                System.err.println("Usage: java AlloyRunner <alloy_file>");
+                System.err.println(USAGE);
                 System.exit(1);
             }
-            
-            // Load Alloy model
-            File alloyFile = new File(args[0]);
-            A4Reporter rep = new A4Reporter();
-
-            // Parse the model
-            CompModule world = CompUtil.parseEverything_fromFile(null, null, alloyFile.getAbsolutePath());
-
-            // Options for the solver
-            A4Options options = new A4Options();
-            //System.out.println(A4Options.SatSolver.values());
-            options.solver = A4Options.SatSolver.parse("nuXmv");
-            //A4Options.SatSolver.make("nuXmv", "nuXmv", "./nuXmv");
-            
-            // Run all commands in the model
-            Command command = world.getAllCommands().get(world.getAllCommands().size() - 1);
-            System.out.println("Executing command: " + command.label);
-            
-            // Start timing
-            A4Solution solution = TranslateAlloyToKodkod.execute_command(rep, world.getAllReachableSigs(), command, options);
-            solution = TranslateAlloyToKodkod.execute_command(rep, world.getAllReachableSigs(), command, options);
-            solution = TranslateAlloyToKodkod.execute_command(rep, world.getAllReachableSigs(), command, options);
-            solution = TranslateAlloyToKodkod.execute_command(rep, world.getAllReachableSigs(), command, options);
-            long startTime = System.currentTimeMillis();
-            solution = TranslateAlloyToKodkod.execute_command(rep, world.getAllReachableSigs(), command, options);
-            // End timing
-            long endTime = System.currentTimeMillis();
-            
-            // Calculate elapsed time
-            long elapsedTime = endTime - startTime;
-
-            // Output elapsed time
-            System.out.println("Finished in " + elapsedTime + "ms");
-
-            // Output whether solution is satisfiable
-            if (solution.satisfiable()) {
-                System.out.println("Instance found. Predicate is consistent.");
+
+            if (args[0].equals("--server")) {
+                serve();
+            } else if (args[0].equals("--batch") && args.length == 2) {
+                batch(args[1]);
             } else {
-                System.out.println("No counterexample found. Assertion may be valid.");
+                solve(RunOptions.parse(args, 0), new SolveResult());
             }
 
+        } catch (IllegalArgumentException e) {
+            System.err.println("Error: " + e.getMessage());
+            System.err.println(USAGE);
+            System.exit(1);
         } catch (Err err) {
             err.printStackTrace();
+        } catch (IOException e) {
+            e.printStackTrace();
+        }
+    }
+
+    // Keep the JVM alive and answer one request per stdin line, with
+    // tab-separated fields:
+    //   parse<TAB><alloy_file>                parse the model only, replacing
+    //                                         the cached module of the file
+    //   solve<TAB>[<option><TAB>...]<alloy_file>
+    //                                         solve the last command, taking the
+    //                                         same options as one-shot mode; the
+    //                                         model is parsed again only if the
+    //                                         file changed
+    //   quit                                  exit the server
+    static void serve() throws IOException {
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+        String line;
+        while ((line = in.readLine()) != null) {
+            line = line.trim();
+            if (line.isEmpty()) {
+                continue;
+            }
+
+            String[] request = line.split("\\t");
+            if (request[0].equals("quit")) {
+                return;
+            }
+
+            try {
+                RunOptions options = RunOptions.parse(request, 1);
+                if (request[0].equals("parse")) {
+                    parse(options.file);
+                } else if (request[0].equals("solve")) {
+                    solve(options, new SolveResult());
+                } else {
+                    System.out.println("Error: unknown request '" + request[0] + "'");
+                }
+            } catch (IllegalArgumentException e) {
+                System.out.println("Error: " + e.getMessage() + " in request '" + line + "'");
+            } catch (Err err) {
+                err.printStackTrace(System.out);
+            }
+
+            System.out.println(END_OF_RESPONSE);
+            System.out.flush();
+        }
+    }
+
+    // Solve every model of a manifest in this JVM. A manifest line has the
+    // same tab-separated fields as a server solve request, without the
+    // leading "solve"; blank lines and lines starting with # are skipped and
+    // relative paths are resolved against the manifest's directory. Every
+    // model is followed by one RESULT_PREFIX line holding a SolveResult.
+    static void batch(String manifestPath) throws IOException {
+        File manifest = new File(manifestPath).getAbsoluteFile();
+        List<String> lines = Files.readAllLines(manifest.toPath());
+        for (int i = 0; i < lines.size(); i++) {
+            String line = lines.get(i).trim();
+            if (line.isEmpty() || line.startsWith("#")) {
+                continue;
+            }
+
+            SolveResult result = new SolveResult();
+            result.line = i + 1;
+            try {
+                RunOptions options = RunOptions.parse(line.split("\\t"), 0);
+                if (!new File(options.file).isAbsolute()) {
+                    options.file = new File(manifest.getParentFile(), options.file).getPath();
+                }
+                result.file = options.file;
+                solve(options, result);
+            } catch (IllegalArgumentException e) {
+                result.error = e.getMessage();
+            } catch (Err err) {
+                err.printStackTrace(System.out);
+                result.error = err.getMessage();
+            }
+
+            System.out.println(RESULT_PREFIX + result.toJson());
+            System.out.flush();
+        }
+    }
+
+    // A parsed model and the file state it was parsed from
+    static class ParsedModule {
+        CompModule world;
+        long modified;
+        long length;
+    }
+
+    // Models parsed by this JVM, by absolute path, so server and batch
+    // sweeps that only change scopes parse every model once
+    static final Map<String, ParsedModule> PARSED = new HashMap<>();
+
+    static CompModule parse(String path) throws Err {
+        File alloyFile = new File(path);
+
+        long startTime = System.currentTimeMillis();
+        CompModule world = CompUtil.parseEverything_fromFile(null, null, alloyFile.getAbsolutePath());
+        long endTime = System.currentTimeMillis();
+
+        System.out.println("Parsed in " + (endTime - startTime) + "ms");
+        ParsedModule parsed = new ParsedModule();
+        parsed.world = world;
+        parsed.modified = alloyFile.lastModified();
+        parsed.length = alloyFile.length();
+        PARSED.put(alloyFile.getAbsolutePath(), parsed);
+        return world;
+    }
+
+    // The cached module of a file, parsed again only if the file changed
+    static CompModule parseCached(String path) throws Err {
+        File alloyFile = new File(path);
+        ParsedModule parsed = PARSED.get(alloyFile.getAbsolutePath());
+        if (parsed != null && parsed.modified == alloyFile.lastModified()
+                && parsed.length == alloyFile.length()) {
+            System.out.println("Reusing parsed model");
+            return parsed.world;
+        }
+        return parse(path);
+    }
+
+    static Sig findSig(CompModule world, String label, String file) {
+        for (Sig sig : world.getAllReachableSigs()) {
+            if (sig.label.equals(label) || sig.label.equals("this/" + label)) {
+                return sig;
+            }
+        }
+        throw new IllegalArgumentException("no sig '" + label + "' in " + file);
+    }
+
+    static void solve(RunOptions runOptions, SolveResult result) throws Err {
+        // Parse the model
+        CompModule world = parseCached(runOptions.file);
+        List<SatSolver> solvers = runOptions.solvers();
+        List<String> ids = new ArrayList<>();
+        for (SatSolver solver : solvers) {
+            ids.add(solver.id());
+        }
+        System.out.println("Solvers: " + String.join(", ", ids));
+
+        // Run the requested command, by default the last one in the model
+        Command command = world.getAllCommands().get(world.getAllCommands().size() - 1);
+        if (runOptions.command != null) {
+            command = null;
+            for (Command c : world.getAllCommands()) {
+                if (c.label.equals(runOptions.command)) {
+                    command = c;
+                }
+            }
+            if (command == null) {
+                throw new IllegalArgumentException("no command '" + runOptions.command + "' in " + runOptions.file);
+            }
+        }
+        for (Scope scope : runOptions.scopes) {
+            command = command.change(findSig(world, scope.sig, runOptions.file), scope.exact, scope.size);
+        }
+        System.out.println("Executing command: " + command.label);
+        if (!runOptions.scopes.isEmpty()) {
+            System.out.println("Scope: " + command);
+        }
+        result.command = command.label;
+
+        // Warm up the JIT before timing
+        boolean satisfiable = false;
+        for (int i = 0; i < runOptions.warmup; i++) {
+            satisfiable = execute(world, command, runOptions, solvers).satisfiable;
+        }
+
+        long totalTime = 0;
+        for (int i = 1; i <= runOptions.iterations; i++) {
+            // Start timing
+            long startTime = System.nanoTime();
+            Execution execution = execute(world, command, runOptions, solvers);
+            // A race starts timing once its members are ready, and ends it when
+            // the answer was found, not when the losers were stopped
+            if (execution.startedAt >= 0) {
+                startTime = execution.startedAt;
+            }
+            long endTime = execution.finishedAt;
+            satisfiable = execution.satisfiable;
+
+            // Solvers that never report a SAT call are counted as all solving
+            long translatedAt = execution.translatedAt < 0 ? startTime : execution.translatedAt;
+            long translationTime = (translatedAt - startTime) / 1_000_000;
+            long elapsedTime = (endTime - startTime) / 1_000_000;
+            totalTime += elapsedTime;
+            result.iterations.add(elapsedTime);
+            result.translations.add(translationTime);
+            result.solvings.add(elapsedTime - translationTime);
+            result.solvers.add(execution.solver);
+
+            System.out.println("Iteration " + i + "/" + runOptions.iterations
+                + ": translation " + translationTime + "ms"
+                + ", solving " + (elapsedTime - translationTime) + "ms"
+                + ", total " + elapsedTime + "ms"
+                + ", solver " + execution.solver);
+        }
+
+        // Output mean elapsed time over the measured iterations
+        result.mean = totalTime / runOptions.iterations;
+        System.out.println("Finished in " + result.mean + "ms");
+        result.satisfiable = satisfiable;
+
+        // Output whether solution is satisfiable
+        if (satisfiable) {
+            System.out.println("Instance found. Predicate is consistent.");
+        } else {
+            System.out.println("No counterexample found. Assertion may be valid.");
         }
     }
 }
@@ -0,0 +1,162 @@
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+# Must match AlloyRunner.END_OF_RESPONSE
+END_OF_RESPONSE = "--- end of response ---"
+
+
+class AlloyDaemon:
+    """A long-lived `AlloyRunner --server` JVM that models are sent to.
+
+    Keeping one JVM alive avoids paying JVM startup, compilation of the
+    source launcher and Alloy class loading on every measurement.
+    """
+
+    def __init__(self, jar_path, runner_path, cores=None):
+        self.command = ["java", "-cp", jar_path, runner_path, "--server"]
+        self.cores = cores
+        self.process = None
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(self.command,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        text=True,
+                                        bufsize=1,
+                                        start_new_session=True,
+                                        preexec_fn=self.pin)
+        # A reader thread lets requests time out without blocking on readline
+        self.lines = queue.Queue()
+        threading.Thread(target=self._pump,
+                         args=(self.process.stdout, self.lines),
+                         daemon=True).start()
+
+    def kill(self):
+        """Kill the JVM and its process group, e.g. its portfolio members."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+    def restart(self):
+        """Replace the JVM by a fresh one, whatever state it was in."""
+        self.kill()
+        self.start()
+
+    def pin(self):
+        # Runs in the child before exec, so the whole JVM stays on its cores
+        if self.cores:
+            os.sched_setaffinity(0, self.cores)
+
+    @staticmethod
+    def _pump(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    def usage(self):
+        """CPU times and peak RSS of the JVM so far, or None without /proc.
+
+        A JVM that exited and was not reaped yet has no memory figures, so
+        it also gives None.
+        """
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                # Fields after the command name, which may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.process.pid}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            return None
+        if "VmHWM" not in status:
+            return None
+        ticks = os.sysconf("SC_CLK_TCK")
+        return {
+            "cpu_user_ms": int(fields[11]) * 1000 / ticks,
+            "cpu_sys_ms": int(fields[12]) * 1000 / ticks,
+            "max_rss_kb": int(status["VmHWM"].split()[0]),
+        }
+
+    def request(self,
+                kind,
+                alloy_file,
+                working_dir=None,
+                timeout=None,
+                options=()):
+        """Send one request and return its output lines.
+
+        options are AlloyRunner command line options such as
+        ["--iterations", "5"].
+
+        Raises subprocess.TimeoutExpired if the response takes longer than
+        timeout seconds, and RuntimeError if the JVM exits while answering;
+        either way the daemon is restarted so it can be reused. A JVM that
+        died while idle is restarted and sent the request again.
+        """
+        if working_dir is not None:
+            alloy_file = os.path.join(working_dir, alloy_file)
+        request = "\t".join([kind, *options, os.path.abspath(alloy_file)])
+
+        try:
+            self.send(request)
+        except OSError:
+            self.restart()
+            try:
+                self.send(request)
+            except OSError as e:
+                self.restart()
+                raise RuntimeError(f"Cannot send to the Alloy daemon: {e}")
+
+        # A cancelled caller's thread may still be waiting here after the
+        # daemon was restarted, so it must leave the new JVM alone
+        process, lines = self.process, self.lines
+        deadline = None if timeout is None else time.monotonic() + timeout
+        output = []
+        while True:
+            try:
+                remaining = None if deadline is None else max(
+                    0, deadline - time.monotonic())
+                line = lines.get(timeout=remaining)
+            except queue.Empty:
+                if self.process is process:
+                    self.restart()
+                raise subprocess.TimeoutExpired(request, timeout)
+
+            if line is None:
+                code = process.wait()
+                if self.process is process:
+                    self.restart()
+                raise RuntimeError(f"Alloy daemon exited with code {code}")
+            if line.rstrip("\n") == END_OF_RESPONSE:
+                return output
+            output.append(line)
+
+    def send(self, request):
+        self.process.stdin.write(request + "\n")
+        self.process.stdin.flush()
+
+    def parse(self, alloy_file, working_dir=None, timeout=None):
+        return self.request("parse", alloy_file, working_dir, timeout)
+
+    def solve(self, alloy_file, working_dir=None, timeout=None, options=()):
+        return self.request("solve", alloy_file, working_dir, timeout,
+                            options)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.write("quit\n")
+            self.process.stdin.close()
+            self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
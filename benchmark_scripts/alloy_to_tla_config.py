@@ -1,17 +1,27 @@
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing
 import os
 import sys
 import jpype
 import jpype.imports
-import time
 import re
 import traceback
 import shutil
 
 
 def change_block_scope(text, name, scope):
+    """Set the scope of the `check name {...}` command in a model's text.
+
+    Raises ValueError if there is no such command, instead of leaving the
+    model with its original scope. Models that are only solved, not
+    copied, can set scopes without rewriting text, see scoped_command.
+    """
     match = re.search(rf'check\s+{name}\s*{{', text)
     if not match:
-        return text
+        raise ValueError(f"No command 'check {name} {{' in the model")
 
     start = match.end() - 1
     stack = ['{']
@@ -25,8 +35,7 @@ def change_block_scope(text, name, scope):
         end += 1
 
     if len(stack):
-        print("SYNTAX ERROR: Incorrect number of { and }")
-        return text
+        raise ValueError(f"Unbalanced braces in command 'check {name}'")
 
     post_block = text[end:]
     scope_match = re.match(r'.*[^\n]+', post_block)
@@ -38,12 +47,49 @@ def change_block_scope(text, name, scope):
         return text[:end] + f' {scope}' + text[end:]
 
 
+# With --layout symlink or packed, the files every config shares are
+# written once to this directory of the config prefix
+SHARED_DIR = "shared"
+# With --layout packed, the per-config files are appended to this archive,
+# one JSON object {"config", "file", "text"} per line
+PACKED_FILE = "configs.jsonl"
+LAYOUTS = ["copy", "symlink", "packed"]
+
+# Set by run() from --layout
+config_layout = "copy"
+
+
+def share_files(base_name, copy_list):
+    """Copy the files every config shares to base_name/shared, once."""
+    shared_path = os.path.join(base_name, SHARED_DIR)
+    os.makedirs(shared_path, exist_ok=True)
+    for item in copy_list:
+        dst_path = os.path.join(shared_path, item)
+        if os.path.exists(dst_path):
+            continue
+        if os.path.isdir(item):
+            shutil.copytree(item, dst_path)
+        else:
+            shutil.copy2(item, dst_path)
+
+
 def create_config_subdirectory(base_name, index, copy_list):
-    """Create a directory for the current config and copy files to it."""
+    """Create a directory for the current config and copy files to it.
+
+    With --layout symlink the files are copied once to the shared
+    directory and the config directory links to them; with --layout
+    packed no directory is created and the returned path only names the
+    config for write_config_file.
+    """
     # Create subdirectory name
     dir_name = f"{base_name}_{index:02d}"
     subdir_path = os.path.join(base_name, dir_name)
 
+    if config_layout != "copy":
+        share_files(base_name, copy_list)
+        if config_layout == "packed":
+            return subdir_path
+
     # Create subdirectory if it doesn't exist
     if not os.path.exists(subdir_path):
         os.makedirs(subdir_path)
@@ -56,7 +102,10 @@ def create_config_subdirectory(base_name, index, copy_list):
         src_path = os.path.join(curr_dir, item)
         dst_path = os.path.join(curr_dir, subdir_path, item)
 
-        if os.path.isdir(src_path):
+        if config_layout == "symlink":
+            if not os.path.lexists(dst_path):
+                os.symlink(os.path.join("..", SHARED_DIR, item), dst_path)
+        elif os.path.isdir(src_path):
             if not os.path.exists(dst_path):
                 shutil.copytree(src_path, dst_path)
         else:
@@ -65,6 +114,36 @@ def create_config_subdirectory(base_name, index, copy_list):
     return subdir_path
 
 
+def write_config_file(config_dir, file_name, text):
+    """Write a file of one config, or append it to the packed archive."""
+    if config_layout == "packed":
+        entry = {
+            "config": os.path.basename(config_dir),
+            "file": file_name,
+            "text": text,
+        }
+        with open(os.path.join(os.path.dirname(config_dir), PACKED_FILE),
+                  "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return
+    with open(os.path.join(config_dir, file_name), "w") as f:
+        f.write(text)
+
+
+def load_packed_configs(config_dir_prefix):
+    """Files of every config in a packed archive, {config: {file: text}}."""
+    path = os.path.join(config_dir_prefix, PACKED_FILE)
+    configs = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    configs.setdefault(entry["config"],
+                                       {})[entry["file"]] = entry["text"]
+    return configs
+
+
 def list_to_quoted_string(string_list):
     return ", ".join(f'"{item}"' for item in string_list)
 
@@ -107,59 +186,555 @@ def get_object_index(t):
     return int(re.search(r'.*?(\d+)$', str(t)).group(1))
 
 
-def run(alloy_run_template, create_alloy_config, create_tla_config):
-    if len(sys.argv) < 3:
-        print("Usage: ./config_gen.py <alloy_file_path> <N>", file=sys.stderr)
-        sys.exit(1)
+# Atoms print as Sig$index, e.g. "{Node$0->Node$1, Node$1->Node$0}"
+ATOM_INDEX_PATTERN = re.compile(r"\$(\d+)")
+
+
+def find_field(world, sig_label, field_label):
+    """Look up a field such as ("this/Node", "neighbors") in a module.
+
+    Field objects stay valid across solution.fork(), so templates look
+    them up once instead of scanning every sig for every instance.
+    """
+    for sig in world.getAllReachableSigs():
+        if str(sig) == sig_label:
+            for field in sig.getFields():
+                if field.label == field_label:
+                    return field
+    raise ValueError(f"No field {field_label} in {sig_label}")
+
+
+def relation_indices(solution, field):
+    """Atom indices of every tuple of a relation, one tuple per row.
 
-    n = int(sys.argv[2])
-    alloy_file_path = sys.argv[1]
+    The relation is evaluated and printed in a single JPype call and the
+    indices are parsed from that string, instead of converting every atom
+    of every tuple separately.
+    """
+    tuples = solution.eval(field)
+    arity = tuples.arity()
+    indices = [int(i) for i in ATOM_INDEX_PATTERN.findall(str(tuples))]
+    return [
+        tuple(indices[k:k + arity]) for k in range(0, len(indices), arity)
+    ]
+
+
+# Written next to the config subdirectories: multiplicity of every config
+CLASSES_FILE = "classes.json"
+
+
+def canonical_form(n, relabel):
+    """Smallest form of an instance over all relabelings of its n atoms.
+
+    relabel(perm) returns a comparable form of the instance with atom i
+    renamed to perm[i]. Two instances get the same canonical form exactly
+    when they are isomorphic. Brute force over n! permutations, which is
+    fine for the sizes TLC can check anyway.
+    """
+    return min(relabel(perm) for perm in itertools.permutations(range(n)))
+
+
+def canonical_graph(n, edges, root=None):
+    """Canonical form of a graph on nodes 0..n-1 with an optional root."""
+    return canonical_form(
+        n, lambda p: (None if root is None else p[root],
+                      tuple(sorted((p[a], p[b]) for a, b in edges))))
 
-    alloy_file_name = os.path.splitext(os.path.basename(alloy_file_path))[0]
-    config_dir_prefix = f"config_{alloy_file_name}_n{n:02d}"
 
-    # Create base directory if it doesn't exist
-    if not os.path.exists(config_dir_prefix):
-        os.makedirs(config_dir_prefix)
+def canonical_set_family(n, sets):
+    """Canonical form of a family of subsets of 0..n-1, e.g. quorums."""
+    return canonical_form(
+        n, lambda p: tuple(sorted(set(
+            tuple(sorted(p[a] for a in members)) for members in sets))))
 
-    # -------- Create Alloy file --------
-    create_alloy_config(config_dir_prefix, alloy_file_path, alloy_file_name, n)
-    # -----------------------------------
 
-    # -------- Create Alloy config generator file --------
+class ConfigClasses:
+    """Isomorphism classes of the configs generated for one N.
+
+    With dedup, a template yields the canonical form of every instance as
+    its "class" metadata and write_configs asks seen(key) before passing
+    it to the sink, skipping it if an isomorphic one was already written;
+    the skipped copy only increments the multiplicity of the
+    representative. Without dedup the key is None and every config is its
+    own class of multiplicity 1.
+    """
+
+    def __init__(self, dedup=False):
+        self.dedup = dedup
+        self.representatives = {}
+        self.classes = {}
+
+    def seen(self, key):
+        if self.dedup and key in self.representatives:
+            name = self.representatives[key]
+            self.classes[name]["multiplicity"] += 1
+            return True
+        return False
+
+    def add(self, key, config_dir, metadata=None):
+        """Record a written config; metadata is kept in the classes file."""
+        name = os.path.basename(config_dir)
+        if self.dedup:
+            self.representatives[key] = name
+        self.classes[name] = {
+            "multiplicity": 1,
+            "class": None if key is None else json.dumps(key),
+        }
+        if metadata is not None:
+            self.classes[name]["metadata"] = metadata
+
+    def save(self, config_dir_prefix):
+        with open(os.path.join(config_dir_prefix, CLASSES_FILE), "w") as f:
+            json.dump(self.classes, f, indent=2, sort_keys=True)
+        if self.dedup:
+            total = sum(c["multiplicity"] for c in self.classes.values())
+            print(f"Kept {len(self.classes)} isomorphism classes of "
+                  f"{total} configs")
+
+
+def load_classes(config_dir_prefix):
+    path = os.path.join(config_dir_prefix, CLASSES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def solutions(solution):
+    """Every instance of a solved command, following solution.fork()."""
+    while solution.satisfiable():
+        yield solution
+        solution = solution.fork(-1)
+
+
+class ConfigFiles:
+    """Sink writing every config to disk in the --layout chosen."""
+
+    def __init__(self, config_dir_prefix, tla_file, copy_list):
+        self.config_dir_prefix = config_dir_prefix
+        self.tla_file = tla_file
+        self.copy_list = copy_list
+
+    def put(self, index, instance_id, text, metadata):
+        config_dir = create_config_subdirectory(self.config_dir_prefix,
+                                                index, self.copy_list)
+        print(f"Created config directory: {config_dir}")
+        write_config_file(config_dir, self.tla_file, text)
+        return config_dir
+
+    def close(self):
+        pass
+
+
+class ConfigCounter:
+    """Sink only counting configs, e.g. to size a sweep before writing it."""
+
+    def __init__(self, config_dir_prefix, tla_file, copy_list):
+        self.config_dir_prefix = config_dir_prefix
+        self.count = 0
+
+    def put(self, index, instance_id, text, metadata):
+        self.count += 1
+        return os.path.join(self.config_dir_prefix,
+                            f"{self.config_dir_prefix}_{index:02d}")
+
+    def close(self):
+        print(f"Counted {self.count} configs in {self.config_dir_prefix}")
+
+
+class ConfigQueue:
+    """Sink handing every config to a consumer as soon as it is rendered.
+
+    The shared modules are written once to the shared directory; every
+    config is put on queue as (config_dir, {file: text}, metadata), and
+    None once enumeration is over, so a consumer can start checking the
+    first configs while Alloy still enumerates the rest. With a bounded
+    queue, put blocks while the consumer is behind. Configs are also
+    appended to the packed archive when the layout is packed, so
+    benchmark.py finds them later.
+    """
+
+    def __init__(self, config_dir_prefix, tla_file, copy_list, queue):
+        self.config_dir_prefix = config_dir_prefix
+        self.tla_file = tla_file
+        self.queue = queue
+        share_files(config_dir_prefix, copy_list)
+
+    def put(self, index, instance_id, text, metadata):
+        config_dir = os.path.join(self.config_dir_prefix,
+                                  f"{self.config_dir_prefix}_{index:02d}")
+        if config_layout == "packed":
+            write_config_file(config_dir, self.tla_file, text)
+        self.queue.put((config_dir, {self.tla_file: text}, metadata))
+        return config_dir
+
+    def close(self):
+        self.queue.put(None)
+
+
+SINKS = {"files": ConfigFiles, "count": ConfigCounter, "queue": ConfigQueue}
+
+# Set by pipeline.py to the queue --sink queue feeds
+pipeline_queue = None
+
+
+def write_configs(instances, sink, classes):
+    """Pass every instance a template yields to a sink.
+
+    instances yields (instance_id, text, metadata): the rendered TLA+
+    file of one config and what the classes file should record about it,
+    plus its canonical form as "class" with dedup. Configs are numbered
+    from 1 in the order they are kept.
+    """
+    index = 1
+    for instance_id, text, metadata in instances:
+        key = metadata.pop("class", None)
+        if classes.seen(key):
+            continue
+        config_dir = sink.put(index, instance_id, text, metadata)
+        classes.add(key, config_dir, metadata or None)
+        index += 1
+    sink.close()
+    if index == 1:
+        print("No satisfying instances.")
+    else:
+        print("No more satisfying instances.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate TLA+ configs from the instances of an Alloy model")
+    parser.add_argument("alloy_file_path")
+    parser.add_argument("n",
+                        type=int,
+                        nargs="+",
+                        help="one or more N; several are enumerated in one "
+                        "JVM from a single parse of the model")
+    parser.add_argument("--workers",
+                        type=int,
+                        default=1,
+                        help="Enumerate partitions of the instance space in "
+                        "this many parallel JVMs")
+    parser.add_argument("--dedup",
+                        action="store_true",
+                        help="Write one config per isomorphism class and "
+                        f"record multiplicities in {CLASSES_FILE}")
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default="copy",
+        help="copy the shared TLA+ modules into every config directory, "
+        f"symlink them from {SHARED_DIR}/, or write no config directories "
+        f"and append the per-config files to {PACKED_FILE}")
+    parser.add_argument("--sink",
+                        choices=sorted(SINKS),
+                        default="files",
+                        help="write the configs, only count them, or (from "
+                        "pipeline.py) stream them to the TLC workers")
+    return parser.parse_args()
+
+
+def write_generator_file(path, alloy_file_path, alloy_run_template, n,
+                         partition=None):
     with open(alloy_file_path, "r") as src:
-        with open("temp.als", "w") as dst:
+        with open(path, "w") as dst:
             dst.write(src.read())
             dst.write("\n")
+            if partition is not None:
+                dst.write(f"fact Partition {{ {partition} }}\n")
             dst.write(alloy_run_template(n))
 
-    alloy_jar_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                  "org.alloytools.alloy.dist.jar")
 
+ALLOY_JAR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "org.alloytools.alloy.dist.jar")
+
+
+def start_jvm():
     if not jpype.isJVMStarted():
-        jpype.startJVM(classpath=[alloy_jar_path])
+        jpype.startJVM(classpath=[ALLOY_JAR])
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_module(path, modified, size):
+    from edu.mit.csail.sdg.parser import CompUtil
+    from edu.mit.csail.sdg.alloy4 import A4Reporter
+    return CompUtil.parseEverything_fromFile(A4Reporter(), None, path)
+
+
+def parse_module(path):
+    """The CompModule of an Alloy file, parsed once per version of the file.
+
+    Modules are cached by path, modification time and size, so solving one
+    model at many scopes parses it once; see scoped_command.
+    """
+    start_jvm()
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _parse_module(path, stat.st_mtime_ns, stat.st_size)
+
+
+def find_command(world, label=None):
+    """The command of a module with the given label, or its last command."""
+    commands = list(world.getAllCommands())
+    if not commands:
+        raise ValueError("The model has no commands")
+    if label is None:
+        return commands[-1]
+    for command in commands:
+        if command.label == label:
+            return command
+    raise ValueError(f"No command {label}, expected one of "
+                     f"{', '.join(str(c.label) for c in commands)}")
+
+
+def find_sig(world, label):
+    """A sig of a module by label, with or without the "this/" prefix."""
+    for sig in world.getAllReachableSigs():
+        if str(sig.label) in (label, f"this/{label}"):
+            return sig
+    raise ValueError(f"No sig {label} in the model")
+
+
+def scoped_command(world, command, scopes):
+    """A copy of command with the scopes of some sigs replaced.
+
+    scopes maps sig labels to a size, or to (size, exact) for an exact
+    scope, e.g. {"Node": (5, True)} for "exactly 5 Node". The module is
+    left untouched, so the same parsed module serves every N.
+    """
+    for label, scope in scopes.items():
+        size, exact = scope if isinstance(scope, tuple) else (scope, False)
+        command = command.change(find_sig(world, label), exact, size)
+    return command
+
+
+def enumerate_instances(generator_file, config_dir_prefix, tla_instances,
+                        make_sink, n, dedup, scopes=None):
+    """Solve the last command of generator_file and stream its configs.
+
+    The instances the template yields go to make_sink(config_dir_prefix).
+    With scopes the command is first re-scoped by scoped_command; as the
+    parsed module is cached, every N solved from the same generator file
+    shares one parse.
+    """
+    start_jvm()
 
-    from edu.mit.csail.sdg.parser import CompUtil, CompModule
-    from edu.mit.csail.sdg.ast import Sig, Command
     from edu.mit.csail.sdg.alloy4 import A4Reporter
-    from edu.mit.csail.sdg.translator import TranslateAlloyToKodkod, A4Options, A4Solution, A4TupleSet, A4Tuple
+    from edu.mit.csail.sdg.translator import TranslateAlloyToKodkod, A4Options
 
     try:
         rep = A4Reporter()
         options = A4Options()
-        world = CompUtil.parseEverything_fromFile(rep, None, "temp.als")
+        world = parse_module(generator_file)
 
         # Run the last command in the model
-        commands = world.getAllCommands()
-        command = commands.get(commands.size() - 1)
+        command = find_command(world)
+        if scopes is not None:
+            command = scoped_command(world, command, scopes)
         print(f"Executing command: {command.label}")
+        if scopes is not None:
+            print(f"Scope: {command}")
         solution = TranslateAlloyToKodkod.execute_command(
             rep, world.getAllReachableSigs(), command, options)
 
-        create_tla_config(config_dir_prefix, world,
-                                    solution, n)
+        classes = ConfigClasses(dedup)
+        write_configs(tla_instances(world, solution, n, dedup),
+                      make_sink(config_dir_prefix), classes)
+        classes.save(config_dir_prefix)
     except Exception as e:
         traceback.print_exc()
 
-    os.remove("temp.als")
-    # ----------------------------------------------------
+
+def enumerate_partition(job):
+    """Worker entry point: enumerate one partition into its staging prefix.
+
+    Every worker is a separate process and therefore owns its own JVM.
+    """
+    (k, partition, alloy_file_path, alloy_run_template, tla_instances,
+     make_sink, n, dedup, staging_prefix) = job
+    generator_file = f"temp_{k:02d}.als"
+    write_generator_file(generator_file, alloy_file_path, alloy_run_template,
+                         n, partition)
+    try:
+        enumerate_instances(generator_file, staging_prefix, tla_instances,
+                            make_sink, n, dedup)
+    finally:
+        os.remove(generator_file)
+    return staging_prefix
+
+
+def merge_partitions(config_dir_prefix, staging_prefixes, dedup):
+    """Move the configs of every staging prefix into config_dir_prefix.
+
+    Configs are renumbered consecutively, partition by partition, so the
+    result looks exactly like the output of a serial enumeration. A class
+    found by several partitions keeps its first representative, with the
+    multiplicities added up.
+    """
+    merged = {}
+    representatives = {}
+    index = 1
+    for staging_prefix in staging_prefixes:
+        if not os.path.isdir(staging_prefix):
+            continue
+        classes = load_classes(staging_prefix)
+        packed = load_packed_configs(staging_prefix)
+        shared_path = os.path.join(staging_prefix, SHARED_DIR)
+        if os.path.isdir(shared_path) and not os.path.exists(
+                os.path.join(config_dir_prefix, SHARED_DIR)):
+            shutil.move(shared_path, config_dir_prefix)
+        config_dirs = [
+            d for d in os.listdir(staging_prefix)
+            if os.path.isdir(os.path.join(staging_prefix, d))
+            and d != SHARED_DIR
+        ]
+        # Configs only counted are in the classes file alone
+        names = set(classes) | set(config_dirs) | packed.keys()
+        for d in sorted(names, key=get_object_index):
+            entry = classes.get(d, {"multiplicity": 1, "class": None})
+            if dedup and entry["class"] in representatives:
+                name = representatives[entry["class"]]
+                merged[name]["multiplicity"] += entry["multiplicity"]
+                continue
+
+            name = f"{config_dir_prefix}_{index:02d}"
+            dst = os.path.join(config_dir_prefix, name)
+            if d in packed:
+                for file_name, text in packed[d].items():
+                    write_config_file(dst, file_name, text)
+            elif d in config_dirs:
+                if os.path.exists(dst):
+                    shutil.rmtree(dst)
+                shutil.move(os.path.join(staging_prefix, d), dst)
+            merged[name] = dict(entry)
+            if dedup:
+                representatives[entry["class"]] = name
+            index += 1
+        shutil.rmtree(staging_prefix)
+
+    with open(os.path.join(config_dir_prefix, CLASSES_FILE), "w") as f:
+        json.dump(merged, f, indent=2, sort_keys=True)
+    print(f"Merged {index - 1} configs from {len(staging_prefixes)} partitions "
+          f"into {config_dir_prefix}")
+
+
+def run(alloy_run_template,
+        create_alloy_config,
+        tla_instances,
+        tla_file,
+        copy_list,
+        alloy_partitions=None,
+        finish_configs=None,
+        alloy_scopes=None):
+    """Generate the Alloy and TLA+ configs of every N on the command line.
+
+    tla_instances(world, solution, n, dedup) is a generator yielding the
+    TLA+ configs of the solved model (see write_configs); each is written
+    to tla_file next to the copy_list files shared by all configs, or
+    handled by another --sink.
+
+    Several N are enumerated one after the other in a single JVM.
+    alloy_scopes(n), if the template provides it, maps sig labels to the
+    scopes of N (see scoped_command): the model is then parsed once, with
+    the run command of the largest N so its Int bitwidth fits every N, and
+    the command of each N is derived from it. Without it, every N writes
+    and parses its own generator file.
+
+    alloy_partitions(n), if the template provides it, returns Alloy
+    formulas that split the instance space into disjoint parts. They must
+    be invariant under renaming of atoms (e.g. a degree or a tuple count)
+    so that Alloy's symmetry breaking keeps exactly one representative of
+    every instance across all parts. With --workers > 1 every part is
+    enumerated by its own process and JVM and the results are merged.
+
+    finish_configs(config_dir_prefix, n), if given, is called once all
+    configs of N are written, e.g. to combine them into a single model.
+    """
+    global config_layout
+    args = parse_args()
+    ns = args.n
+    alloy_file_path = args.alloy_file_path
+    config_layout = args.layout
+
+    alloy_file_name = os.path.splitext(os.path.basename(alloy_file_path))[0]
+    config_dir_prefixes = {}
+    for n in ns:
+        config_dir_prefix = f"config_{alloy_file_name}_n{n:02d}"
+        config_dir_prefixes[n] = config_dir_prefix
+
+        # Create base directory if it doesn't exist
+        if not os.path.exists(config_dir_prefix):
+            os.makedirs(config_dir_prefix)
+        # A packed archive is appended to, so start from an empty one
+        packed_path = os.path.join(config_dir_prefix, PACKED_FILE)
+        if os.path.exists(packed_path):
+            os.remove(packed_path)
+
+        # -------- Create Alloy file --------
+        create_alloy_config(config_dir_prefix, alloy_file_path,
+                            alloy_file_name, n)
+        # -----------------------------------
+
+    make_sink = functools.partial(SINKS[args.sink],
+                                  tla_file=tla_file,
+                                  copy_list=copy_list)
+    if args.sink == "queue":
+        if pipeline_queue is None:
+            sys.exit("--sink queue is only available through pipeline.py")
+        if len(ns) > 1:
+            sys.exit("pipeline.py enumerates one N at a time")
+        make_sink = functools.partial(make_sink, queue=pipeline_queue)
+
+    # Partitions would each end the queue, so pipelines enumerate serially
+    if (args.workers > 1 and alloy_partitions is not None
+            and args.sink != "queue"):
+        # Templates call run() at import time, so workers must be forked
+        # rather than spawned; the parent never starts a JVM itself
+        context = multiprocessing.get_context("fork")
+        with context.Pool(args.workers) as pool:
+            for n in ns:
+                config_dir_prefix = config_dir_prefixes[n]
+                partitions = alloy_partitions(n)
+                jobs = [(k, partition, alloy_file_path, alloy_run_template,
+                         tla_instances, make_sink, n, args.dedup,
+                         f"{config_dir_prefix}.part{k:02d}")
+                        for k, partition in enumerate(partitions)]
+                print(f"Enumerating {len(partitions)} partitions of N={n} "
+                      f"on {args.workers} workers")
+                staging_prefixes = pool.map(enumerate_partition, jobs,
+                                            chunksize=1)
+                merge_partitions(config_dir_prefix, staging_prefixes,
+                                 args.dedup)
+                if finish_configs is not None:
+                    finish_configs(config_dir_prefix, n)
+    else:
+        if args.workers > 1 and args.sink == "queue":
+            print("⚠️  Pipelines enumerate serially, ignoring --workers.")
+        elif args.workers > 1:
+            print("⚠️  This template defines no partitions, enumerating serially.")
+        if len(ns) > 1:
+            print(f"Enumerating N={', '.join(map(str, ns))} in one JVM")
+
+        # -------- Create Alloy config generator file --------
+        if alloy_scopes is not None:
+            write_generator_file("temp.als", alloy_file_path,
+                                 alloy_run_template, max(ns))
+        for n in ns:
+            if alloy_scopes is None:
+                generator_file = f"temp_n{n:02d}.als"
+                write_generator_file(generator_file, alloy_file_path,
+                                     alloy_run_template, n)
+                scopes = None
+            else:
+                generator_file = "temp.als"
+                scopes = alloy_scopes(n)
+            enumerate_instances(generator_file, config_dir_prefixes[n],
+                                tla_instances, make_sink, n, args.dedup,
+                                scopes)
+            if alloy_scopes is None:
+                os.remove(generator_file)
+            if finish_configs is not None:
+                finish_configs(config_dir_prefixes[n], n)
+        if alloy_scopes is not None:
+            os.remove("temp.als")
+        # ----------------------------------------------------
@@ -1,57 +1,22 @@
 #!/usr/bin/env nix-shell
 #!nix-shell -i python -p "python3.withPackages(ps: with ps; [ matplotlib ])"
 
-import subprocess
+import argparse
+import json
 import re
+import shutil
+import tempfile
 import matplotlib.pyplot as plt
-import statistics
-import sys
 import numpy as np
 import os
-from pathlib import Path
 
-
-def benchmark(command, working_dir=None):
-    finished_time_ms = None
-    pattern = re.compile(r"Finished in (\d+)ms")
-
-    process = subprocess.Popen(command.split(),
-                               stdout=subprocess.PIPE,
-                               stderr=subprocess.STDOUT,
-                               text=True,
-                               bufsize=1,
-                               cwd=working_dir)
-
-    for line in process.stdout:
-        # print(line, end='')  # Stream to terminal
-        match = pattern.search(line)
-        if match:
-            finished_time_ms = int(match.group(1))
-
-    process.wait()
-
-    if finished_time_ms is not None:
-        print(
-            f"\n✔️  Model checking time: {finished_time_ms} ms ({finished_time_ms / 1000:.3f} s)"
-        )
-    else:
-        print("⚠️  Could not find 'Finished in ...ms' in output.")
-
-    return finished_time_ms
-
-
-def run_benchmarks(command, n_runs, working_dir=None):
-    times = []
-
-    for i in range(n_runs):
-        print(
-            f"\n▶️  Run '{command}' ({i + 1}/{n_runs}) (workdir={working_dir})"
-        )
-        time_ms = benchmark(command, working_dir)
-        if time_ms is not None:
-            times.append(time_ms)
-
-    return times
+from runner import add_solver_arguments, make_job, run_jobs, solver_options
+from sweep import add_sweep_arguments, budget_sweep, growth_series, report_growth
+from stats import add_stats_arguments, format_summary, mean_and_stdev, more_runs, runs_label, summarize
+from scaling import add_worker_arguments, plot_scaling, report_scaling, select_workers, workers_option
+from tlc_profiles import add_profile_arguments, load_profiles, profile_metadir, profile_options, profile_record, select_profile, tlc_command
+from tlc_output import add_metric_argument, median_states, throughput
+from results import DEFAULT_RESULTS_FILE, append_result, completed_runs, config_hash, job_key, load_results, new_sweep_id, samples_by
 
 
 def find_config_directories(base_path):
@@ -68,24 +33,291 @@ def find_als_file(base_path):
             return d
 
 
-def find_tla_file(base_path):
-    for d in os.listdir(base_path):
+def find_tla_file(base_path, files=()):
+    for d in [*os.listdir(base_path), *files]:
         if d.endswith(".cfg"):
             return os.path.splitext(d)[0] + ".tla", d
 
 
-def sum_arrays(a, b):
-    if not a:  # First iteration
-        return b
-    elif not b:
-        return a
-    else:
-        return [v1 + v2 for v1, v2 in zip(a, b)]
-
-
-def main():
-    runs = 3  # Number of runs per N
-
+# Written by the config generators, see alloy_to_tla_config.CLASSES_FILE
+CLASSES_FILE = "classes.json"
+
+
+def load_multiplicities(config_path):
+    """Number of generated configs each TLA+ config directory stands for.
+
+    With --dedup the generators keep one config per isomorphism class;
+    configs missing from the classes file count once.
+    """
+    path = os.path.join(config_path, CLASSES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {d: c["multiplicity"] for d, c in json.load(f).items()}
+
+
+# Written by the config generators with --layout packed, see
+# alloy_to_tla_config.PACKED_FILE and SHARED_DIR
+PACKED_FILE = "configs.jsonl"
+SHARED_DIR = "shared"
+
+
+def load_packed_configs(config_path):
+    """Per-config files of a packed archive, {config: {file: text}}.
+
+    A packed config is run from a temporary directory that links the
+    files in SHARED_DIR and holds its own files, see runner.stage_files.
+    """
+    path = os.path.join(config_path, PACKED_FILE)
+    if not os.path.exists(path):
+        return {}
+    configs = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                configs.setdefault(entry["config"],
+                                   {})[entry["file"]] = entry["text"]
+    return configs
+
+
+# Written by generators that can combine all configs of N into one model
+SINGLE_RUN_DIR = "single_run"
+# Unmeasured run of the single-run model that dumps its states
+SINGLE_RUN_STATES = "single_run:states"
+GID_PATTERN = re.compile(r"^/\\ gid = (\d+)$")
+
+
+def states_by_config(dump_path, config_names):
+    """Count the distinct states of every graph in a TLC state dump.
+
+    State k of the single-run model explores config config_names[gid-1].
+    """
+    counts = {name: 0 for name in config_names}
+    with open(dump_path) as f:
+        for line in f:
+            match = GID_PATTERN.match(line.strip())
+            if match:
+                counts[config_names[int(match.group(1)) - 1]] += 1
+    return counts
+
+
+def single_run_weights(records):
+    """Scale factor of every single-run TLC time for deduplicated configs.
+
+    Each graph's share of the single run is estimated by its share of the
+    distinct states; weighting the shares by multiplicity gives the time
+    all generated configs would take. Without --dedup the factor is 1.
+    """
+    weights = {}
+    for record in records:
+        states = record.get("states_by_config")
+        if not states or not sum(states.values()):
+            continue
+        multiplicities = record.get("multiplicities", {})
+        weights[(record["config_dir"], SINGLE_RUN_DIR)] = sum(
+            multiplicities.get(d, 1) * s
+            for d, s in states.items()) / sum(states.values())
+    return weights
+
+
+def report_states(states, multiplicities):
+    print(f"\n{'config':<32} {'distinct states':>16} {'multiplicity':>12}")
+    for name in sorted(states):
+        print(f"{name:<32} {states[name]:>16} {multiplicities.get(name, 1):>12}")
+
+
+def job_record(config_dir, n, tla_dir, key, inputs, multiplicity=1,
+               workers=None, texts=None):
+    return {
+        "config_dir": config_dir,
+        "tla_config": tla_dir,
+        "n": n,
+        "tool": "alloy" if tla_dir is None else "tlc",
+        "job_key": key,
+        "config_hash": config_hash(inputs, texts),
+        "multiplicity": multiplicity,
+        "workers": workers,
+    }
+
+
+def samples_by_workers(records):
+    """Samples of every (config_dir, tla_config, workers) in a results store.
+
+    Alloy runs have no worker count; TLC runs recorded before worker
+    counts existed ran TLC's default of 1 worker.
+    """
+    samples = samples_by(records, "config_dir", "tla_config", "workers",
+                         version="job_key")
+    return {(config_dir, tla_dir,
+             1 if tla_dir is not None and workers is None else workers): times
+            for (config_dir, tla_dir, workers), times in samples.items()}
+
+
+def tla_components(config_dir, tla_dirs, workers, times, multiplicities,
+                   states):
+    """TLC time components of one config directory at one worker count.
+
+    There is one component per TLC run making up the time of N; adding
+    them as independent measurements keeps repetitions of different
+    configs from being paired up. Returns the components and the states
+    generated by the same runs, both weighted by multiplicity.
+    """
+    # The single-run model covers every config of N in one TLC run
+    single_run_times = times.get((config_dir, SINGLE_RUN_DIR, workers), [])
+    if single_run_times:
+        weight = multiplicities.get((config_dir, SINGLE_RUN_DIR), 1)
+        return ([[t * weight for t in single_run_times]],
+                states.get((config_dir, SINGLE_RUN_DIR), 0) * weight)
+
+    components = []
+    tla_states = 0
+    for tla_dir in tla_dirs:
+        times_add = times.get((config_dir, tla_dir, workers), [])
+        if times_add:
+            # A class representative stands in for all its members
+            multiplicity = multiplicities.get((config_dir, tla_dir), 1)
+            components.append([t * multiplicity for t in times_add])
+            tla_states += states.get((config_dir, tla_dir), 0) * multiplicity
+    return components, tla_states
+
+
+def load_times(records):
+    """Rebuild the measured configs and their times from a results store."""
+    times = samples_by_workers(records)
+    n_by_config = {r["config_dir"]: r["n"] for r in records}
+    config_dirs = sorted(n_by_config)
+    tla_dirs_by_config = {config_dir: [] for config_dir in config_dirs}
+    multiplicities = {}
+    for record in records:
+        tla_dirs = tla_dirs_by_config[record["config_dir"]]
+        # A single run stands for the configs whose states it counted
+        config_names = record.get("states_by_config") or [record["tla_config"]]
+        for tla_dir in config_names:
+            if tla_dir is None or tla_dir.startswith(SINGLE_RUN_DIR):
+                continue
+            if tla_dir not in tla_dirs:
+                tla_dirs.append(tla_dir)
+            multiplicities[(record["config_dir"], tla_dir)] = record.get(
+                "multiplicities", {}).get(tla_dir, record.get("multiplicity", 1))
+    for tla_dirs in tla_dirs_by_config.values():
+        tla_dirs.sort()
+    multiplicities.update(single_run_weights(records))
+    return (config_dirs, [n_by_config[d] for d in config_dirs],
+            tla_dirs_by_config, times, multiplicities)
+
+
+def single_run_benchmarks(config_dir, n, single_run_path, runs,
+                          multiplicities, worker_counts, profile_name, profile):
+    """The measured runs of a single-run model, plus one run dumping states.
+
+    The model is measured with every worker count, all under the given
+    TLC tuning profile. Dumping every state
+    slows TLC down, so the states are counted in a separate, unmeasured
+    run whose record carries the per-config counts.
+    """
+    with open(os.path.join(single_run_path, "graphs.json")) as f:
+        config_names = json.load(f)
+    tla_file, tla_config = find_tla_file(single_run_path)
+    tla_command = tlc_command(tla_file, tla_config, profile)
+    inputs = [
+        os.path.join(single_run_path, f) for f in os.listdir(single_run_path)
+        if f.endswith((".tla", ".cfg", ".json"))
+    ]
+    dump_path = os.path.abspath(os.path.join(single_run_path, "states.dump"))
+    states_command = f"{tla_command} -dump {dump_path}"
+    states_record = {
+        **job_record(config_dir, n, SINGLE_RUN_STATES,
+                     job_key("tlc", profile_options(states_command, profile),
+                             inputs), inputs),
+        **profile_record(profile_name, profile),
+        "dump": dump_path,
+        "config_names": config_names,
+        "multiplicities": {d: multiplicities.get(d, 1) for d in config_names},
+    }
+    benchmarks = []
+    for workers in worker_counts:
+        command = f"{tla_command} {workers_option(workers)}"
+        record = {
+            **job_record(config_dir, n, SINGLE_RUN_DIR,
+                         job_key("tlc", profile_options(command, profile),
+                                 inputs), inputs,
+                         workers=workers),
+            **profile_record(profile_name, profile),
+        }
+        benchmarks.append((record, command, single_run_path, runs, None))
+    benchmarks.append((states_record, states_command, single_run_path, 1,
+                       None))
+    return benchmarks
+
+
+def save_run(results_path, job, run):
+    """Append a run to the store, counting states if it dumped them."""
+    record = {**job["record"], **run}
+    dump_path = record.pop("dump", None)
+    config_names = record.pop("config_names", None)
+    if dump_path is not None and os.path.exists(dump_path):
+        record["states_by_config"] = states_by_config(dump_path, config_names)
+        os.remove(dump_path)
+        report_states(record["states_by_config"], record["multiplicities"])
+    # The dumping run is slower than a measured one, keep it out of the plots
+    if record["tla_config"] == SINGLE_RUN_STATES:
+        record["samples_ms"] = []
+    append_result(results_path, record)
+
+
+def run_alloy_batch(args, alloy_jobs, alloy_options, jar_path, runner_path):
+    """Solve every Alloy job in one `AlloyRunner --batch` JVM.
+
+    Each job becomes one manifest line and its result line is appended to
+    the store as if the job had run on its own. Jobs without a result,
+    e.g. because the batch timed out, are not recorded and so are measured
+    again by the next sweep.
+    """
+    manifest_dir = tempfile.mkdtemp(prefix="alloy-batch-")
+    manifest_path = os.path.join(manifest_dir, "manifest.tsv")
+    with open(manifest_path, "w") as f:
+        for job in alloy_jobs:
+            alloy_file = os.path.abspath(
+                os.path.join(job["working_dir"], job["command"].split()[-1]))
+            f.write("\t".join([*alloy_options.split(), alloy_file]) + "\n")
+
+    def save_batch(job, run):
+        results = {r["line"]: r for r in run.get("batch_results", [])}
+        for line, alloy_job in enumerate(alloy_jobs, start=1):
+            if line not in results:
+                continue
+            result = results[line]
+            append_result(args.results, {
+                **alloy_job["record"],
+                "command": job["command"],
+                "batch": True,
+                "exit_status": run["exit_status"],
+                "error": result["error"],
+                "solver_time_ms": result["mean_ms"],
+                "samples_ms": [] if result["error"] else result["iterations_ms"],
+                "solvers": result["solvers"],
+                "translation_ms": result.get("translation_ms", []),
+                "solving_ms": result.get("solving_ms", []),
+            })
+        print(f"Alloy batch solved {len(results)}/{len(alloy_jobs)} models")
+
+    command = f"java -cp {jar_path} {runner_path} --batch {manifest_path}"
+    try:
+        run_jobs([make_job(command, "alloy")],
+                 timeout=args.timeout * len(alloy_jobs) if args.timeout else None,
+                 on_result=save_batch)
+    finally:
+        shutil.rmtree(manifest_dir, ignore_errors=True)
+
+
+def measure(args, runs, alloy_runs, alloy_options):
+    """Discover the config directories below the working directory and time them.
+
+    Repetitions whose job key is already in the results store are skipped
+    unless --rerun is given, so an interrupted sweep resumes where it
+    stopped and only changed configs are measured again.
+    """
     script_dir = os.path.dirname(os.path.abspath(__file__))
     base_dir = "."  # Base directory where config_Simple_n* directories are located
 
@@ -96,55 +328,339 @@ def main():
                 for d in config_dirs]  # Extract n from "config_Simple_nX"
     print("Testing N: " + str(n_values))
 
-    alloy_means = []
-    alloy_stds = []
-    tla_means = []
-    tla_stds = []
-    tla_config_counts = []
+    s = lambda s: os.path.join(script_dir, s)
+    daemon_command = (s('org.alloytools.alloy.dist.jar'),
+                      s('AlloyRunner.java')) if args.alloy_daemon else None
 
-    for config_dir, n in zip(config_dirs, n_values):
-        print(f"\n================== N = {n} ==================")
+    # The spec is named after the directory its configs were generated in
+    spec = os.path.basename(os.getcwd())
+    profiles = load_profiles(args.tlc_profiles)
 
+    # Every (config, tool) pair to measure; tla_dir is None for Alloy.
+    # Entries are (record, command, working dir, runs, files), files being
+    # those of a packed config
+    benchmarks = []
+    tla_dirs_by_config = {}
+    multiplicities = {}
+    for config_dir, n in zip(config_dirs, n_values):
         # Path to Alloy file
         alloy_file = find_als_file(config_dir)
-
-        s = lambda s: os.path.join(script_dir, s)
-
-        # Benchmark Alloy
-        alloy_command = f"java -cp {s('org.alloytools.alloy.dist.jar')} {s('AlloyRunner.java')} {alloy_file}"
-        alloy_times = run_benchmarks(alloy_command, runs,
-                                     os.path.join(base_dir, config_dir))
-
-        if alloy_times:
-            alloy_means.append(statistics.mean(alloy_times))
-            alloy_stds.append(statistics.stdev(alloy_times))
+        if args.alloy_daemon:
+            alloy_command = f"{alloy_options} {alloy_file}"
         else:
-            alloy_means.append(0)
-            alloy_stds.append(0)
+            alloy_command = f"java -cp {s('org.alloytools.alloy.dist.jar')} {s('AlloyRunner.java')} {alloy_options} {alloy_file}"
+        alloy_inputs = [os.path.join(base_dir, config_dir, alloy_file)]
+        alloy_key = job_key("alloy", alloy_options, alloy_inputs,
+                            [s('AlloyRunner.java')])
+        benchmarks.append((job_record(config_dir, n, None, alloy_key,
+                                      alloy_inputs),
+                           alloy_command, os.path.join(base_dir, config_dir),
+                           alloy_runs, None))
 
         # Find all TLA+ directories for this config
-        tla_dirs = find_config_directories(os.path.join(base_dir, config_dir))
-        tla_config_counts.append(len(tla_dirs))  # Store count of TLA configs
-        tla_times = []
+        packed = load_packed_configs(os.path.join(base_dir, config_dir))
+        tla_dirs = sorted(
+            set(find_config_directories(os.path.join(base_dir, config_dir)))
+            | packed.keys())
+        tla_dirs_by_config[config_dir] = tla_dirs
+        config_multiplicities = load_multiplicities(
+            os.path.join(base_dir, config_dir))
+        for tla_dir in tla_dirs:
+            multiplicities[(config_dir, tla_dir)] = config_multiplicities.get(
+                tla_dir, 1)
+
+        profile_name, profile = select_profile(profiles, spec, n,
+                                               args.tlc_profile)
+        single_run_path = os.path.join(base_dir, config_dir, SINGLE_RUN_DIR)
+        if args.single_run and os.path.isdir(single_run_path):
+            benchmarks.extend(
+                single_run_benchmarks(config_dir, n, single_run_path, runs,
+                                      config_multiplicities, args.tlc_workers,
+                                      profile_name, profile))
+            continue
 
         for tla_dir in tla_dirs:
-            tla_file, tla_config = find_tla_file(
-                os.path.join(config_dir, tla_dir))
-
-            # Benchmark each TLA+ configuration
-            tla_command = f"tlc {tla_file} -tool -modelcheck -coverage 1 -config {tla_config}"
-            times_add = run_benchmarks(
-                tla_command, runs,
-                os.path.join(os.path.join(base_dir, config_dir), tla_dir))
-            if times_add:
-                tla_times = sum_arrays(tla_times, times_add)
-
-        if tla_times:
-            tla_means.append(statistics.mean(tla_times))
-            tla_stds.append(statistics.stdev(tla_times))
-        else:
-            tla_means.append(0)
-            tla_stds.append(0)
+            multiplicity = multiplicities[(config_dir, tla_dir)]
+            files = packed.get(tla_dir)
+            tla_path = os.path.join(os.path.join(base_dir, config_dir),
+                                    SHARED_DIR if files else tla_dir)
+            tla_file, tla_config = find_tla_file(tla_path, files or {})
+            tla_command = tlc_command(tla_file, tla_config, profile)
+            tla_inputs = [
+                os.path.join(tla_path, f) for f in os.listdir(tla_path)
+                if f.endswith((".tla", ".cfg")) and f not in (files or {})
+            ]
+            for workers in args.tlc_workers:
+                command = f"{tla_command} {workers_option(workers)}"
+                tla_key = job_key("tlc", profile_options(command, profile),
+                                  tla_inputs, texts=files)
+                benchmarks.append(({
+                    **job_record(config_dir, n, tla_dir, tla_key, tla_inputs,
+                                 multiplicity, workers, files),
+                    **profile_record(profile_name, profile),
+                }, command, tla_path, runs, files))
+
+    done = set()
+    if os.path.exists(args.results) and not args.rerun:
+        done = completed_runs(load_results(args.results))
+
+    sweep = {"sweep": new_sweep_id(), "spec": spec}
+    jobs = [
+        make_job(command, record["tool"], working_dir, {
+            **sweep,
+            **record, "repetition": i
+        }, profile_metadir(record), files)
+        for record, command, working_dir, n_runs, files in benchmarks
+        for i in range(n_runs) if (record["job_key"], i) not in done
+    ]
+    print(f"{len(jobs)} runs to measure, "
+          f"{sum(b[3] for b in benchmarks) - len(jobs)} already in {args.results}")
+
+    def stored_runs():
+        """Samples of every stored run of this sweep's jobs, by repetition."""
+        runs = {}
+        if os.path.exists(args.results):
+            for r in load_results(args.results):
+                runs.setdefault(r.get("job_key"), {})[r.get("repetition")] = (
+                    r.get("samples_ms") or [])
+        return runs
+
+    def run_measurement(jobs):
+        if args.alloy_batch:
+            alloy_jobs = [job for job in jobs if job["tool"] == "alloy"]
+            jobs = [job for job in jobs if job["tool"] != "alloy"]
+            if alloy_jobs:
+                run_alloy_batch(args, alloy_jobs, alloy_options,
+                                s('org.alloytools.alloy.dist.jar'),
+                                s('AlloyRunner.java'))
+
+        run_jobs(jobs,
+                 limit=args.jobs,
+                 timeout=args.timeout,
+                 cores_per_job=args.cores_per_job if args.jobs > 1 else None,
+                 daemon_command=daemon_command,
+                 on_result=lambda job, run: save_run(args.results, job, run))
+
+    def measure_precisely(jobs, measured):
+        """Run jobs, then repeat the measured benchmarks until precise enough.
+
+        Without --ci-target nothing is repeated; with it, every benchmark
+        whose confidence interval is still too wide gets one more run per
+        round, up to --max-runs.
+        """
+        run_measurement(jobs)
+        while True:
+            runs = stored_runs()
+            extra = []
+            for record, command, working_dir, n_runs, files in measured:
+                by_repetition = runs.get(record["job_key"], {})
+                samples = [t for i in sorted(by_repetition) for t in by_repetition[i]]
+                count = more_runs(samples, args, len(by_repetition))
+                first = max(by_repetition, default=-1) + 1
+                extra.extend(
+                    make_job(command, record["tool"], working_dir, {
+                        **sweep,
+                        **record, "repetition": first + i
+                    }, profile_metadir(record), files) for i in range(count))
+            if not extra:
+                return
+            print(f"\n🔁 {len(extra)} more runs to narrow confidence intervals")
+            run_measurement(extra)
+
+    measured = [b for b in benchmarks if b[0]["tla_config"] != SINGLE_RUN_STATES]
+
+    def measure_n(n, tools):
+        """Run the pending jobs of the given tools at N.
+
+        Returns every tool's time components at N, one per config (see
+        stats.summarize), or none if any of its runs failed or timed out,
+        for the budget check. TLC times are those of the worker count
+        select_workers picks.
+        """
+        measure_precisely([
+            job for job in jobs
+            if job["record"]["n"] == n and job["tool"] in tools
+        ], [b for b in measured if b[0]["n"] == n and b[0]["tool"] in tools])
+        runs = stored_runs()
+        times = {}
+        for tool in tools:
+            runs_by_workers = {}
+            for record, *_ in measured:
+                if record["n"] == n and record["tool"] == tool:
+                    runs_by_workers.setdefault(record["workers"], []).append(
+                        runs.get(record["job_key"], {}))
+            by_workers = {}
+            for workers, tool_runs in runs_by_workers.items():
+                components = [[t for i in sorted(r) for t in r[i]] for r in tool_runs]
+                by_workers[workers] = components if all(
+                    len(r) and all(r.values()) for r in tool_runs) else []
+            if tool == "tlc":
+                times[tool] = select_workers(by_workers, args.best_workers)[1]
+            else:
+                times[tool] = by_workers.get(None, [])
+        return times
+
+    if args.budget is None:
+        measure_precisely(jobs, measured)
+    else:
+        # Measure N in increasing order so large N can be skipped
+        budget_sweep(measure_n, ["alloy", "tlc"], sorted(set(n_values)),
+                     args.budget * 1000)
+
+    # Times come from the store, so resumed runs are combined with new ones
+    keys = {record["job_key"] for record, *_ in benchmarks}
+    records = [
+        r for r in load_results(args.results) if r.get("job_key") in keys
+    ] if os.path.exists(args.results) else []
+    times = samples_by_workers(records)
+    multiplicities.update(single_run_weights(records))
+
+    return config_dirs, n_values, tla_dirs_by_config, times, multiplicities
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j",
+                        "--jobs",
+                        type=int,
+                        default=1,
+                        help="number of checker runs executed concurrently; "
+                        "every TLC run gets its own -metadir, so repetitions "
+                        "of one config do not share its states/ directory")
+    parser.add_argument("--cores-per-job",
+                        type=int,
+                        default=1,
+                        help="CPUs each parallel job is pinned to")
+    alloy_mode = parser.add_mutually_exclusive_group()
+    alloy_mode.add_argument("--alloy-daemon",
+                            action="store_true",
+                            help="solve Alloy models in a persistent AlloyRunner JVM")
+    alloy_mode.add_argument(
+        "--alloy-batch",
+        action="store_true",
+        help="solve all Alloy models of the sweep in one AlloyRunner --batch JVM")
+    parser.add_argument("--alloy-warmup",
+                        type=int,
+                        default=4,
+                        help="unmeasured AlloyRunner iterations per launch")
+    parser.add_argument(
+        "--alloy-iterations",
+        type=int,
+        default=1,
+        help="measured AlloyRunner iterations per launch; above 1, Alloy is "
+        "launched once per config and each iteration is one sample")
+    add_solver_arguments(parser)
+    add_sweep_arguments(parser, adaptive=False)
+    add_stats_arguments(parser)
+    add_metric_argument(parser)
+    add_worker_arguments(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--results",
+                        default=DEFAULT_RESULTS_FILE,
+                        help="JSON-lines file every run is appended to")
+    parser.add_argument(
+        "--from-results",
+        metavar="PATH",
+        help="regenerate the plots from a results store without running checkers")
+    parser.add_argument("--timeout",
+                        type=float,
+                        help="wall-clock limit in seconds for each checker run")
+    parser.add_argument(
+        "--single-run",
+        action="store_true",
+        help=f"check all configs of N with one TLC run of the {SINGLE_RUN_DIR} "
+        "model where the generator emitted one")
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="measure every run again even if the results store has it")
+    args = parser.parse_args()
+
+    if args.timeout is None:
+        # A run over budget is not worth finishing
+        args.timeout = args.budget
+    if args.jobs > 1 and max(args.tlc_workers) > args.cores_per_job:
+        print(f"⚠️  TLC runs with up to {max(args.tlc_workers)} workers are "
+              f"pinned to {args.cores_per_job} cores, pass --cores-per-job "
+              f"{max(args.tlc_workers)} to give every worker a core")
+
+    runs = args.runs
+    alloy_runs = 1 if args.alloy_iterations > 1 else runs
+    alloy_options = f"--warmup {args.alloy_warmup} --iterations {args.alloy_iterations} {solver_options(args)}".strip()
+
+    if args.from_results:
+        config_dirs, n_values, tla_dirs_by_config, times, multiplicities = load_times(
+            load_results(args.from_results))
+    else:
+        config_dirs, n_values, tla_dirs_by_config, times, multiplicities = measure(
+            args, runs, alloy_runs, alloy_options)
+
+    alloy_means = []
+    alloy_stds = []
+    tla_means = []
+    tla_stds = []
+    tla_config_counts = []
+    tla_class_counts = []
+    tla_throughputs = []
+    tla_throughput_stds = []
+    times_by_n = {}
+    scaling = {}
+    store = args.from_results or args.results
+    states = median_states(
+        load_results(store) if os.path.exists(store) else [], "config_dir",
+        "tla_config", version="job_key")
+
+    for config_dir, n in zip(config_dirs, n_values):
+        print(f"\n================== N = {n} ==================")
+
+        alloy_times = times.get((config_dir, None, None), [])
+        alloy_times = [alloy_times] if alloy_times else []
+
+        tla_dirs = tla_dirs_by_config[config_dir]
+        # Store count of TLA configs, counting every member of a class
+        tla_config_counts.append(
+            sum(multiplicities.get((config_dir, d), 1) for d in tla_dirs))
+        tla_class_counts.append(len(tla_dirs))
+        worker_counts = sorted({
+            workers for d, tla_dir, workers in times
+            if d == config_dir and tla_dir is not None
+        })
+        components = {
+            workers: tla_components(config_dir, tla_dirs, workers, times,
+                                    multiplicities, states)
+            for workers in worker_counts
+        }
+        scaling[n] = {w: c for w, (c, tla_states) in components.items()}
+        workers, tla_times = select_workers(scaling[n], args.best_workers)
+        tla_states = components[workers][1] if workers in components else 0
+        if len(worker_counts) > 1:
+            print(f"TLC times are those with {workers} workers")
+        if tla_class_counts[-1] != tla_config_counts[-1]:
+            print(f"{tla_class_counts[-1]} TLA+ configs stand for "
+                  f"{tla_config_counts[-1]} generated configs")
+
+        alloy_summary = summarize(alloy_times, args.confidence)
+        tla_summary = summarize(tla_times, args.confidence)
+        print(f"Alloy: {format_summary(alloy_summary, args.confidence)}")
+        print(f"TLA+:  {format_summary(tla_summary, args.confidence)}")
+
+        mean, std = mean_and_stdev(alloy_summary)
+        alloy_means.append(mean)
+        alloy_stds.append(std)
+        mean, std = mean_and_stdev(tla_summary)
+        tla_means.append(mean)
+        tla_stds.append(std)
+        value, std = throughput(tla_states, tla_summary)
+        tla_throughputs.append(value)
+        tla_throughput_stds.append(std)
+        times_by_n[n] = (alloy_times, tla_times)
+
+    report_growth(growth_series(times_by_n),
+                  args.budget * 1000 if args.budget is not None else None)
+    # Only stores with several worker counts have a scaling curve
+    several_workers = any(len(by_workers) > 1 for by_workers in scaling.values())
+    if several_workers:
+        report_scaling(scaling)
 
     # Plot 1: Performance comparison (original plot)
     # Plotting as side-by-side bars
@@ -174,7 +690,7 @@ def main():
                        capsize=5)
 
     plt.title(
-        f"Alloy vs TLA+: TeachingConcurrency\n({runs} runs per measurement)")
+        f"Alloy vs TLA+: TeachingConcurrency\n({runs_label(args)})")
     plt.xlabel("N (Problem Size)")
     plt.ylabel("Time (ms)")
     plt.xticks(x, n_values)
@@ -195,6 +711,26 @@ def main():
     plt.tight_layout()
     plt.savefig('time_comparison.png', dpi=300, bbox_inches='tight')
 
+    if args.metric == "throughput":
+        # Alloy reports no state counts, so only TLC has a throughput
+        plt.figure(figsize=(10, 6))
+        x = np.arange(len(n_values))
+        plt.bar(x, tla_throughputs, width=0.35, color='#ff7f7f', label='TLA+',
+                yerr=tla_throughput_stds, capsize=5)
+        plt.title(f"TLC throughput\n({runs_label(args)})")
+        plt.xlabel("N (Problem Size)")
+        plt.ylabel("Generated states per second")
+        plt.xticks(x, n_values)
+        plt.legend()
+        plt.grid(True, axis='y')
+        plt.tight_layout()
+        plt.savefig('tlc_throughput.png', dpi=300, bbox_inches='tight')
+
+    if several_workers:
+        plot_scaling(scaling,
+                     f"TLC worker scaling: {os.path.basename(os.getcwd())}",
+                     'tlc_scaling.png')
+
     # Plot 2: Configuration count (new plot)
     plt.figure(figsize=(10, 6))
     plt.bar(n_values, tla_config_counts, color='#6a9662', width=0.6)
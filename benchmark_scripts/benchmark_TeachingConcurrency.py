@@ -1,86 +1,211 @@
 #!/usr/bin/env nix-shell
 #!nix-shell -i python -p "python3.withPackages(ps: with ps; [ matplotlib ])"
 
+import argparse
+import os
 import subprocess
-import re
 import matplotlib.pyplot as plt
-import statistics
 import sys
 import numpy as np
 
-def benchmark(command):
-    finished_time_ms = None
-    pattern = re.compile(r"Finished in (\d+)ms")
+from alloy_daemon import AlloyDaemon
+from runner import add_solver_arguments, make_job, run_jobs, solver_options
+from sweep import add_sweep_arguments, budget_sweep, growth_series, report_growth, sweep_n_values
+from stats import add_stats_arguments, format_summary, mean_and_stdev, more_runs, runs_label, summarize
+from scaling import add_worker_arguments, plot_scaling, report_scaling, select_workers, workers_option
+from tlc_profiles import add_profile_arguments, load_profiles, profile_metadir, profile_record, select_profile, tlc_command
+from tlc_output import add_metric_argument, median_states, throughput
+from results import DEFAULT_RESULTS_FILE, append_result, load_results, new_sweep_id, samples_by
 
-    process = subprocess.Popen(
-        command.split(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
+def run_benchmarks(commands, options, store, record):
+    """Run repetitions of each ((tool, workers), command, fields) through the shared runner.
 
-    for line in process.stdout:
-        # print(line, end='')  # Stream to terminal
-        match = pattern.search(line)
-        if match:
-            finished_time_ms = int(match.group(1))
+    fields are stored with the runs of their command only. Every command runs --runs times; with --ci-target, a command whose
+    confidence interval is still too wide gets more repetitions, one per
+    parallel job at a time, up to --max-runs. Returns a dict mapping each
+    (tool, workers) to its times; failed and timed-out runs are recorded
+    but contribute no times.
+    """
+    stats_args = options["stats"]
+    times = {key: [] for key, command, fields in commands}
+    runs_done = {key: 0 for key, command, fields in commands}
+    pending = {key: stats_args.runs for key, command, fields in commands}
 
-    process.wait()
+    def save(job, run):
+        append_result(store, {**job["record"], **run})
 
-    if finished_time_ms is not None:
-        print(f"\n✔️ Model checking time: {finished_time_ms} ms ({finished_time_ms / 1000:.3f} s)")
+    while any(pending.values()):
+        jobs = [make_job(command, tool, None,
+                         {**record, **fields, "tool": tool, "workers": workers,
+                          "repetition": runs_done[(tool, workers)] + i},
+                         profile_metadir(fields))
+                for (tool, workers), command, fields in commands
+                for i in range(pending[(tool, workers)])]
+        runs = run_jobs(jobs,
+                        limit=options["jobs"],
+                        timeout=options["timeout"],
+                        daemons=options["daemons"],
+                        on_result=save)
+        for job, run in zip(jobs, runs):
+            times[(job["tool"], job["record"]["workers"])].extend(run["samples_ms"])
+        for key in times:
+            runs_done[key] += pending[key]
+            pending[key] = more_runs(times[key], stats_args, runs_done[key],
+                                     options["jobs"])
+    return times
+
+def modify_constants(n):
+    subprocess.run(["python", "change_TeachingConcurrency.py", str(n)], check=True)
+
+def measure_n(n, tools, options, store, sweep):
+    """Time the given tools for one N, returning a dict of tool to times.
+
+    Both checkers read different files, so the Alloy and TLA+ runs of one N
+    share the concurrency limit. Each tool's times are a single component,
+    see stats.summarize. TLC runs with every --tlc-workers count and its
+    times are those of the count select_workers picks.
+    """
+    print(f"\n================== N = {n} ==================")
+    modify_constants(n)
+    record = {"sweep": sweep, "spec": "TeachingConcurrency", "n": n}
+
+    # The scope is set on the command, so Simple.als is parsed as it is
+    alloy_args = f"{options['solver']} --command Invariants --scope Process={n} Simple.als".strip()
+    if options["daemons"]:
+        command1 = alloy_args
     else:
-        print("⚠️ Could not find 'Finished in ...ms' in output.")
+        command1 = f"java -cp org.alloytools.alloy.dist.jar AlloyRunner.java {alloy_args}"
+    profile_name, profile = select_profile(options["profiles"],
+                                           "TeachingConcurrency", n,
+                                           options["tlc_profile"])
+    command2 = tlc_command("Simple.tla", "Simple.cfg", profile)
 
-    return finished_time_ms
+    commands = []
+    if "alloy" in tools:
+        commands.append((("alloy", None), command1, {}))
+    if "tlc" in tools:
+        commands.extend(((("tlc", w), f"{command2} {workers_option(w)}",
+                          profile_record(profile_name, profile))
+                         for w in options["workers"]))
+    times = run_benchmarks(commands, options, store, record)
 
-def run_benchmarks(command, n_runs=10):
-    times = []
+    components = {key: [samples] if samples else [] for key, samples in times.items()}
+    result = {}
+    if "alloy" in tools:
+        result["alloy"] = components[("alloy", None)]
+    if "tlc" in tools:
+        workers, result["tlc"] = select_workers(
+            {w: c for (tool, w), c in components.items() if tool == "tlc"},
+            options["best_workers"])
+        if len(options["workers"]) > 1:
+            print(f"TLC times at N = {n} are those with {workers} workers")
+    return result
 
-    for i in range(n_runs):
-        print(f"\n▶️ Run {command} ({i + 1}/{n_runs})")
-        time_ms = benchmark(command)
-        if time_ms is not None:
-            times.append(time_ms)
+def measure(n_values, options, store, budget_ms=None):
+    """Time Alloy and TLA+ for each N, returning a dict of N to both times."""
+    sweep = new_sweep_id()
+    times = budget_sweep(
+        lambda n, tools: measure_n(n, tools, options, store, sweep),
+        ["alloy", "tlc"], n_values, budget_ms)
+    return {n: (t["alloy"], t["tlc"]) for n, t in times.items()}
 
-    return times
+def scaling_times(records):
+    """TLC time components of every N and worker count in a results store."""
+    samples = samples_by(records, "n", "tool", "workers")
+    by_n = {}
+    for (n, tool, workers), times in samples.items():
+        if tool == "tlc":
+            # Runs recorded before worker counts ran TLC's default 1 worker
+            by_n.setdefault(n, {})[workers or 1] = [times]
+    return by_n
 
-def modify_constants(n):
-    subprocess.run(["python", "change_TeachingConcurrency.py", str(n)], check=True)
+def load_times(records, best_workers=False):
+    """Rebuild the per-N times of measure() from a results store."""
+    samples = samples_by(records, "n", "tool")
+    by_workers = scaling_times(records)
+    return {n: ([samples[(n, "alloy")]] if (n, "alloy") in samples else [],
+                select_workers(by_workers.get(n, {}), best_workers)[1])
+            for n in sorted({r["n"] for r in records})}
 
 def main():
-    runs = 3  # Number of runs per N
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alloy-daemon", action="store_true",
+                        help="solve Alloy models in a persistent AlloyRunner JVM")
+    add_solver_arguments(parser)
+    add_sweep_arguments(parser)
+    add_stats_arguments(parser)
+    add_metric_argument(parser)
+    add_worker_arguments(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE,
+                        help="JSON-lines file every run is appended to")
+    parser.add_argument("--from-results", metavar="PATH",
+                        help="regenerate the plot from a results store without running checkers")
+    parser.add_argument("--timeout", type=float,
+                        help="wall-clock limit in seconds for each checker run")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of checker runs executed concurrently")
+    args = parser.parse_args()
+
     n_values = [1, 3, 5, 7, 9]  # X-axis
 
+    if args.from_results:
+        times = load_times(load_results(args.from_results), args.best_workers)
+        n_values = sorted(times)
+    else:
+        daemons = []
+        if args.alloy_daemon:
+            daemons = [AlloyDaemon("org.alloytools.alloy.dist.jar", "AlloyRunner.java")
+                       for _ in range(args.jobs)]
+        # A run over budget is not worth finishing
+        timeout = args.timeout if args.timeout is not None else args.budget
+        options = {"jobs": args.jobs, "timeout": timeout, "daemons": daemons,
+                   "solver": solver_options(args), "stats": args,
+                   "workers": args.tlc_workers, "best_workers": args.best_workers,
+                   "profiles": load_profiles(args.tlc_profiles),
+                   "tlc_profile": args.tlc_profile}
+        budget_ms = args.budget * 1000 if args.budget is not None else None
+        times = measure(sweep_n_values(args, n_values), options,
+                        args.results, budget_ms)
+        n_values = sorted(times)
+        for daemon in daemons:
+            daemon.close()
+
+    report_growth(growth_series(times),
+                  args.budget * 1000 if args.budget is not None else None)
+
     alloy_means = []
     alloy_stds = []
     tla_means = []
     tla_stds = []
+    tla_throughputs = []
+    tla_throughput_stds = []
+    store = args.from_results or args.results
+    records = load_results(store) if os.path.exists(store) else []
+    states = median_states(records, "n", "tool")
+    scaling = scaling_times(records)
+    # Only stores with several worker counts have a scaling curve
+    several_workers = any(len(by_workers) > 1 for by_workers in scaling.values())
+    if several_workers:
+        report_scaling(scaling)
 
     for n in n_values:
-        print(f"\n================== N = {n} ==================")
-        modify_constants(n)
-
-        command1 = "java -cp org.alloytools.alloy.dist.jar AlloyRunner.java Simple.als"
-        command2 = "tlc Simple.tla -tool -modelcheck -coverage 1 -config Simple.cfg"
+        times1, times2 = times[n]
+        alloy_summary = summarize(times1, args.confidence)
+        tla_summary = summarize(times2, args.confidence)
+        print(f"\nN = {n}")
+        print(f"Alloy: {format_summary(alloy_summary, args.confidence)}")
+        print(f"TLA+:  {format_summary(tla_summary, args.confidence)}")
 
-        times1 = run_benchmarks(command1, runs)
-        times2 = run_benchmarks(command2, runs)
-
-        if times1:
-            alloy_means.append(statistics.mean(times1))
-            alloy_stds.append(statistics.stdev(times1) if len(times1) > 1 else 0)
-        else:
-            alloy_means.append(0)
-            alloy_stds.append(0)
-
-        if times2:
-            tla_means.append(statistics.mean(times2))
-            tla_stds.append(statistics.stdev(times2) if len(times2) > 1 else 0)
-        else:
-            tla_means.append(0)
-            tla_stds.append(0)
+        mean, std = mean_and_stdev(alloy_summary)
+        alloy_means.append(mean)
+        alloy_stds.append(std)
+        mean, std = mean_and_stdev(tla_summary)
+        tla_means.append(mean)
+        tla_stds.append(std)
+        value, std = throughput(states.get((n, "tlc")), tla_summary)
+        tla_throughputs.append(value)
+        tla_throughput_stds.append(std)
 
     # Plotting as side-by-side bars
     plt.figure(figsize=(10, 6))
@@ -100,7 +225,7 @@ def main():
                       color=tla_color, label='TLA+', yerr=tla_stds,
                       capsize=5)
     
-    plt.title(f"Alloy vs TLA+: TeachingConcurrency\n({runs} runs per measurement)")
+    plt.title(f"Alloy vs TLA+: TeachingConcurrency\n({runs_label(args)})")
     plt.xlabel("N (Problem Size)")
     plt.ylabel("Time (ms)")
     plt.xticks(x, n_values)
@@ -119,5 +244,24 @@ def main():
     # plt.show()
     plt.savefig('teaching_concurrency.png', dpi=300, bbox_inches='tight')
 
+    if several_workers:
+        plot_scaling(scaling, "TLC worker scaling: TeachingConcurrency",
+                     'tlc_scaling.png')
+
+    if args.metric == "throughput":
+        # Alloy reports no state counts, so only TLC has a throughput
+        plt.figure(figsize=(10, 6))
+        x = np.arange(len(n_values))
+        plt.bar(x, tla_throughputs, width=0.35, color='#ff7f7f', label='TLA+',
+                yerr=tla_throughput_stds, capsize=5)
+        plt.title(f"TLC throughput: TeachingConcurrency\n({runs_label(args)})")
+        plt.xlabel("N (Problem Size)")
+        plt.ylabel("Generated states per second")
+        plt.xticks(x, n_values)
+        plt.legend()
+        plt.grid(True, axis='y')
+        plt.tight_layout()
+        plt.savefig('tlc_throughput.png', dpi=300, bbox_inches='tight')
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
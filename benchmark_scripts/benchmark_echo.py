@@ -1,55 +1,51 @@
 #!/usr/bin/env nix-shell
 #!nix-shell -i python -p "python3.withPackages(ps: with ps; [ matplotlib ])"
 
+import argparse
+import os
 import subprocess
-import re
 import matplotlib.pyplot as plt
-import statistics
 import sys
 import numpy as np
 
-def benchmark(command, timeout):
-    finished_time_ms = None
-    pattern = re.compile(r"Finished in (\d+)ms")
+from alloy_daemon import AlloyDaemon
+from runner import add_solver_arguments, make_job, run_jobs, solver_options
+from sweep import add_sweep_arguments, budget_sweep, growth_series, report_growth, sweep_n_values
+from stats import add_stats_arguments, format_summary, mean_and_stdev, more_runs, runs_label, summarize
+from scaling import add_worker_arguments, plot_scaling, report_scaling, select_workers, workers_option
+from tlc_profiles import add_profile_arguments, load_profiles, profile_metadir, profile_record, select_profile, tlc_command
+from tlc_output import add_metric_argument, median_states, throughput
+from results import DEFAULT_RESULTS_FILE, append_result, load_results, new_sweep_id, samples_by
 
-    process = subprocess.Popen(
-        command.split(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
-
-    try:
-        process.wait(timeout)
-
-        for line in process.stdout:
-            # print(line, end='')  # Stream to terminal
-            match = pattern.search(line)
-            if match:
-                finished_time_ms = int(match.group(1))
-
-    except subprocess.TimeoutExpired:
-        print("Timeout expired!")
-        process.kill()
-
-    if finished_time_ms is not None:
-        print(f"\n✔️ Model checking time: {finished_time_ms} ms ({finished_time_ms / 1000:.3f} s)")
-    else:
-        print("⚠️ Could not find 'Finished in ...ms' in output.")
+def run_benchmarks(command, tool, options, store, record):
+    """Run repetitions of command through the shared runner.
 
-    return finished_time_ms
-
-
-def run_benchmarks(command, n_runs=10, timeout=None):
+    The command runs --runs times; with --ci-target, it is repeated, one
+    run per parallel job at a time, until its confidence interval is
+    narrow enough or --max-runs is reached. Failed and timed-out runs are
+    recorded but contribute no times.
+    """
+    stats_args = options["stats"]
     times = []
+    runs_done = 0
+    pending = stats_args.runs
 
-    for i in range(n_runs):
-        print(f"\n▶️ Run {command} ({i + 1}/{n_runs})")
-        time_ms = benchmark(command, timeout)
-        if not time_ms: return []
-        times.append(time_ms)
+    def save(job, run):
+        append_result(store, {**job["record"], **run})
 
+    while pending:
+        jobs = [make_job(command, tool, None,
+                         {**record, "tool": tool, "repetition": runs_done + i},
+                         profile_metadir(record))
+                for i in range(pending)]
+        runs = run_jobs(jobs,
+                        limit=options["jobs"],
+                        timeout=options["timeout"],
+                        daemons=options["daemons"],
+                        on_result=save)
+        times.extend(t for run in runs for t in run["samples_ms"])
+        runs_done += pending
+        pending = more_runs(times, stats_args, runs_done, options["jobs"])
     return times
 
 def modify_constants(n, i):
@@ -61,47 +57,190 @@ def modify_constants(n, i):
     )
     return int(result.stdout.strip())
 
-def sum_arrays(a, b):
-    if not a:  # First iteration
-        return b
-    elif not b:
-        return a
+def measure_n(n, tools, options, store, sweep):
+    """Time the given tools for one N, returning a dict of tool to times.
+
+    Subruns share MCEcho.tla in the working directory, so only the
+    repetitions of one subrun run concurrently. The TLA+ times have one
+    component per subrun, whose total is the time of N (see
+    stats.summarize); a subrun without any successful run empties them
+    and skips the remaining subruns. Every subrun is checked with each
+    --tlc-workers count and the times are those of the count
+    select_workers picks.
+    """
+    print(f"\n================== N = {n} ==================")
+    subruns_count = modify_constants(n, 0)
+    record = {"sweep": sweep, "spec": "Echo", "n": n}
+    times = {}
+
+    # The scope is set on the command, so echo.als is parsed as it is
+    alloy_args = f"{options['solver']} --command AncestorProperties --scope Node={n} echo.als".strip()
+    if options["daemons"]:
+        command1 = alloy_args
     else:
-        return [v1+v2 for v1, v2 in zip(a, b)]
+        command1 = f"java -cp org.alloytools.alloy.dist.jar AlloyRunner.java {alloy_args}"
+    profile_name, profile = select_profile(options["profiles"], "Echo", n,
+                                           options["tlc_profile"])
+    command2 = tlc_command("MCEcho.tla", "MCEcho.cfg", profile)
+
+    if "alloy" in tools:
+        times1 = run_benchmarks(command1, "alloy", options, store,
+                                {**record, "subrun": None})
+        times["alloy"] = [times1] if times1 else []
+    if "tlc" in tools:
+        # Subrun components of every worker count, None once one failed
+        by_workers = {w: [] for w in options["workers"]}
+        for i in range(1, subruns_count + 1):
+            if all(times2 is None for times2 in by_workers.values()):
+                break
+            print(f"\n============= N = {n} (subrun = {i}) ===============")
+            modify_constants(n, i)
+            for w, times2 in by_workers.items():
+                if times2 is None:
+                    continue
+                times2_add = run_benchmarks(f"{command2} {workers_option(w)}",
+                                            "tlc", options, store,
+                                            {**record, "subrun": i, "workers": w,
+                                             **profile_record(profile_name, profile)})
+                if times2_add:
+                    times2.append(times2_add)
+                else:
+                    by_workers[w] = None
+        workers, times["tlc"] = select_workers(
+            {w: times2 or [] for w, times2 in by_workers.items()},
+            options["best_workers"])
+        if len(by_workers) > 1:
+            print(f"TLC times at N = {n} are those with {workers} workers")
+
+    return times
+
+
+def measure(n_values, options, store, budget_ms=None):
+    """Time Alloy and every TLA+ subrun for each N.
+
+    Returns a dict mapping N to the Alloy times and the TLA+ times of
+    every subrun.
+    """
+    sweep = new_sweep_id()
+    times = budget_sweep(
+        lambda n, tools: measure_n(n, tools, options, store, sweep),
+        ["alloy", "tlc"], n_values, budget_ms)
+    return {n: (t["alloy"], t["tlc"]) for n, t in times.items()}
+
+
+def scaling_times(records):
+    """TLC subrun components of every N and worker count in a results store."""
+    samples = samples_by(records, "n", "tool", "subrun", "workers")
+    by_n = {}
+
+    for n in sorted({r["n"] for r in records}):
+        tlc_records = [r for r in records if r["n"] == n and r["tool"] == "tlc"]
+        subruns = sorted({r["subrun"] for r in tlc_records})
+        for workers in {r.get("workers") for r in tlc_records}:
+            times2 = [samples.get((n, "tlc", i, workers)) for i in subruns]
+            # A subrun without a single successful run leaves no valid total;
+            # runs recorded before worker counts ran TLC's default 1 worker
+            by_n.setdefault(n, {})[workers or 1] = times2 if all(times2) else []
+
+    return by_n
+
+
+def load_times(records, best_workers=False):
+    """Rebuild the per-N times of measure() from a results store."""
+    samples = samples_by(records, "n", "tool", "subrun")
+    by_workers = scaling_times(records)
+    times = {}
+
+    for n in sorted({r["n"] for r in records}):
+        times1 = [samples[(n, "alloy", None)]] if (n, "alloy", None) in samples else []
+        times2 = select_workers(by_workers.get(n, {}), best_workers)[1]
+        times[n] = (times1, times2)
+
+    return times
 
 
 def main():
-    runs = 3  # Number of runs per N
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alloy-daemon", action="store_true",
+                        help="solve Alloy models in a persistent AlloyRunner JVM")
+    add_solver_arguments(parser)
+    add_sweep_arguments(parser)
+    add_stats_arguments(parser)
+    add_metric_argument(parser)
+    add_worker_arguments(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE,
+                        help="JSON-lines file every run is appended to")
+    parser.add_argument("--from-results", metavar="PATH",
+                        help="regenerate the plot from a results store without running checkers")
+    parser.add_argument("--timeout", type=float,
+                        help="wall-clock limit in seconds for each checker run")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of repetitions run concurrently")
+    args = parser.parse_args()
+
     n_values = [1, 2, 3, 4]  # X-axis
 
+    if args.from_results:
+        times = load_times(load_results(args.from_results), args.best_workers)
+        n_values = sorted(times)
+    else:
+        daemons = []
+        if args.alloy_daemon:
+            daemons = [AlloyDaemon("org.alloytools.alloy.dist.jar", "AlloyRunner.java")
+                       for _ in range(args.jobs)]
+        # A run over budget is not worth finishing
+        timeout = args.timeout if args.timeout is not None else args.budget
+        options = {"jobs": args.jobs, "timeout": timeout, "daemons": daemons,
+                   "solver": solver_options(args), "stats": args,
+                   "workers": args.tlc_workers, "best_workers": args.best_workers,
+                   "profiles": load_profiles(args.tlc_profiles),
+                   "tlc_profile": args.tlc_profile}
+        budget_ms = args.budget * 1000 if args.budget is not None else None
+        times = measure(sweep_n_values(args, n_values), options,
+                        args.results, budget_ms)
+        n_values = sorted(times)
+        for daemon in daemons:
+            daemon.close()
+
+    report_growth(growth_series(times),
+                  args.budget * 1000 if args.budget is not None else None)
+
     alloy_means = []
     alloy_stds = []
     tla_means = []
     tla_stds = []
+    tla_throughputs = []
+    tla_throughput_stds = []
+    store = args.from_results or args.results
+    records = load_results(store) if os.path.exists(store) else []
+    states = median_states(records, "n", "tool", "subrun")
+    scaling = scaling_times(records)
+    # Only stores with several worker counts have a scaling curve
+    several_workers = any(len(by_workers) > 1 for by_workers in scaling.values())
+    if several_workers:
+        report_scaling(scaling)
 
     for n in n_values:
-        print(f"\n================== N = {n} ==================")
-        subruns_count = modify_constants(n, 0)
-
-        command1 = "java -cp org.alloytools.alloy.dist.jar AlloyRunner.java echo.als"
-        command2 = "tlc MCEcho.tla -tool -modelcheck -coverage 1 -config MCEcho.cfg"
-
-        times1 = run_benchmarks(command1, runs)
-        times2 = []
-        for i in range(1, subruns_count + 1):
-            print(f"\n============= N = {n} (subrun = {i}) ===============")
-            modify_constants(n, i)
-            times2_add = run_benchmarks(command2, runs)
-            if not times2_add:
-                times2 = []
-                break
-            times2 = sum_arrays(times2, times2_add)
-
-        alloy_means.append(statistics.mean(times1) if len(times1) else 0)
-        alloy_stds.append(statistics.stdev(times1) if len(times1) else 0)
+        times1, times2 = times[n]
+        alloy_summary = summarize(times1, args.confidence)
+        tla_summary = summarize(times2, args.confidence)
+        print(f"\nN = {n}")
+        print(f"Alloy: {format_summary(alloy_summary, args.confidence)}")
+        print(f"TLA+:  {format_summary(tla_summary, args.confidence)}")
 
-        tla_means.append(statistics.mean(times2) if len(times2) else 0)
-        tla_stds.append(statistics.stdev(times2) if len(times2) else 0)
+        mean, std = mean_and_stdev(alloy_summary)
+        alloy_means.append(mean)
+        alloy_stds.append(std)
+        mean, std = mean_and_stdev(tla_summary)
+        tla_means.append(mean)
+        tla_stds.append(std)
+        # TLC states are counted per subrun
+        tla_states = sum(s for (m, tool, subrun), s in states.items()
+                         if m == n and tool == "tlc")
+        value, std = throughput(tla_states, tla_summary)
+        tla_throughputs.append(value)
+        tla_throughput_stds.append(std)
 
     # Plotting as side-by-side bars
     plt.figure(figsize=(10, 6))
@@ -130,7 +269,7 @@ def main():
                        capsize=5)
 
     plt.title(
-        f"Alloy vs TLA+: Echo\n({runs} runs per measurement)")
+        f"Alloy vs TLA+: Echo\n({runs_label(args)})")
     plt.xlabel("N (Problem Size)")
     plt.ylabel("Time (ms)")
     plt.xticks(x, n_values)
@@ -153,5 +292,23 @@ def main():
     # plt.show()
     plt.savefig('teaching_concurrency.png', dpi=300, bbox_inches='tight')
 
+    if several_workers:
+        plot_scaling(scaling, "TLC worker scaling: Echo", 'tlc_scaling.png')
+
+    if args.metric == "throughput":
+        # Alloy reports no state counts, so only TLC has a throughput
+        plt.figure(figsize=(10, 6))
+        x = np.arange(len(n_values))
+        plt.bar(x, tla_throughputs, width=0.35, color='#ff7f7f', label='TLA+',
+                yerr=tla_throughput_stds, capsize=5)
+        plt.title(f"TLC throughput: Echo\n({runs_label(args)})")
+        plt.xlabel("N (Problem Size)")
+        plt.ylabel("Generated states per second")
+        plt.xticks(x, n_values)
+        plt.legend()
+        plt.grid(True, axis='y')
+        plt.tight_layout()
+        plt.savefig('tlc_throughput.png', dpi=300, bbox_inches='tight')
+
 if __name__ == "__main__":
     main()
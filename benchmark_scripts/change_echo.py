@@ -24,11 +24,3 @@ if i > 0:
 
     with open("MCEcho.tla", "w") as f:
         f.write(x)
-
-with open("echo.als", 'r') as f:
-    x = f.read()
-
-x = sub(r'(for)\s*(\d+)\s*(but)\s*(1)\s*(..)\s*(steps)', fr'\1 {n} \3 \4\5\6', x)
-
-with open("echo.als", 'w') as f:
-    f.write(x)
\ No newline at end of file
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import math
+import statistics
+import sys
+
+from results import latest_records, load_results, samples_by
+
+# Enumerate the exact Mann-Whitney distribution up to this many rankings
+EXACT_LIMIT = 100000
+
+
+def match_key(record):
+    """What a run measured: spec, tool, N, TLC workers and profile, and config.
+
+    Configs are matched by the hash of their inputs when the store has
+    one, so renamed config directories still match; otherwise by their
+    directory names or Echo subrun. Runs without a worker count ran with
+    one worker, and runs without a profile with the default one.
+    """
+    config = record.get("config_hash")
+    if config is None:
+        config = (record.get("config_dir"), record.get("tla_config"),
+                  record.get("subrun"))
+    return (record.get("spec"), record.get("tool"), record.get("n"),
+            record.get("workers") or 1, record.get("tlc_profile") or "default",
+            config)
+
+
+def label(record):
+    parts = [record.get("spec") or "?", record.get("tool"), f"N={record.get('n')}"]
+    for field in ("config_dir", "tla_config"):
+        if record.get(field):
+            parts.append(record[field])
+    if record.get("subrun") is not None:
+        parts.append(f"subrun {record['subrun']}")
+    if record.get("workers"):
+        parts.append(f"{record['workers']} workers")
+    if record.get("tlc_profile") not in (None, "default"):
+        parts.append(f"profile {record['tlc_profile']}")
+    return " ".join(str(p) for p in parts)
+
+
+def job_samples(records):
+    """Samples and labels of the latest version of every job in a store.
+
+    Returns (samples, labels): samples maps match keys to the samples of
+    successful runs, labels maps every key, failed ones included, to a
+    readable name. Stores written by benchmark.py are versioned by job
+    key so resumed sweeps are combined; the others by sweep.
+    """
+    records = [
+        dict(r, match=match_key(r)) for r in records
+        # The state-counting runs of --single-run are not timed
+        if "states_by_config" not in r
+    ]
+    hashed = [r for r in records if "job_key" in r]
+    plain = [r for r in records if "job_key" not in r]
+
+    samples = {}
+    labels = {}
+    for group, version in ((hashed, "job_key"), (plain, "sweep")):
+        for key, times in samples_by(group, "match", version=version).items():
+            samples[key[0]] = times
+        for record in latest_records(group, "match", version=version):
+            labels[record["match"]] = label(record)
+    return samples, labels
+
+
+def ranks(values):
+    """Ranks of values starting at 1, ties getting their average rank."""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    result = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            result[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return result
+
+
+def mann_whitney(a, b):
+    """Two-sided Mann-Whitney U test of samples a and b.
+
+    Returns (U of a, p-value). The p-value is exact, ties included, when
+    the number of rankings is small, as it is for a few repetitions per
+    job; otherwise it uses the normal approximation with tie correction.
+    """
+    n1, n2 = len(a), len(b)
+    all_ranks = ranks(list(a) + list(b))
+    rank_sum = sum(all_ranks[:n1])
+    u = rank_sum - n1 * (n1 + 1) / 2
+    expected = n1 * (n1 + n2 + 1) / 2
+    observed = abs(rank_sum - expected)
+
+    if math.comb(n1 + n2, n1) <= EXACT_LIMIT:
+        sums = [sum(c) for c in itertools.combinations(all_ranks, n1)]
+        extreme = sum(1 for s in sums if abs(s - expected) >= observed - 1e-9)
+        return u, extreme / len(sums)
+
+    n = n1 + n2
+    ties = sum(t**3 - t for t in (all_ranks.count(r) for r in set(all_ranks)))
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance == 0:
+        return u, 1.0
+    z = max(0, observed - 0.5) / math.sqrt(variance)
+    return u, math.erfc(z / math.sqrt(2))
+
+
+def smallest_p(n1, n2):
+    """Smallest two-sided p-value the exact test can give for n1 and n2 runs."""
+    return min(1.0, 2 / math.comb(n1 + n2, n1))
+
+
+def separated(a, b):
+    """Whether every sample of b is above every sample of a, or below all."""
+    return min(b) > max(a) or max(b) < min(a)
+
+
+def compare(baseline, candidate, threshold, alpha, small_sample_threshold):
+    """Compare every job measured in both stores.
+
+    A job is a regression when its median time grew by more than
+    threshold (a fraction) and the Mann-Whitney test rejects equal
+    distributions at level alpha, or when it only failed in the
+    candidate. Jobs with too few runs for any p-value to reach alpha
+    (e.g. 3 per side) use an effect-size rule instead: the change counts
+    when the two samples do not overlap and the median moved by more
+    than small_sample_threshold. Such rows are marked "small sample".
+    Returns (rows, only_baseline, only_candidate), rows sorted from the
+    largest regression down.
+    """
+    base_samples, base_labels = job_samples(baseline)
+    cand_samples, cand_labels = job_samples(candidate)
+
+    rows = []
+    for key in base_labels.keys() & cand_labels.keys():
+        base = base_samples.get(key, [])
+        cand = cand_samples.get(key, [])
+        row = {
+            "job": cand_labels[key],
+            "baseline_ms": statistics.median(base) if base else None,
+            "candidate_ms": statistics.median(cand) if cand else None,
+            "change": None,
+            "p": None,
+            "small_sample": False,
+        }
+        if not base:
+            row["verdict"] = "fixed" if cand else "failed in both"
+        elif not cand:
+            row["verdict"] = "regression (failed)"
+        else:
+            row["change"] = row["candidate_ms"] / row["baseline_ms"] - 1
+            row["p"] = mann_whitney(base, cand)[1]
+            if smallest_p(len(base), len(cand)) > alpha:
+                row["small_sample"] = True
+                significant = (separated(base, cand) and
+                               abs(row["change"]) > small_sample_threshold)
+            else:
+                significant = row["p"] < alpha
+            if row["change"] > threshold:
+                row["verdict"] = "regression" if significant else "slower (not significant)"
+            elif row["change"] < -threshold:
+                row["verdict"] = "faster" if significant else "faster (not significant)"
+            else:
+                row["verdict"] = "unchanged"
+            if row["small_sample"] and significant:
+                row["verdict"] += " (small sample)"
+        rows.append(row)
+
+    rows.sort(key=lambda r: (not r["verdict"].startswith("regression"),
+                             -(r["change"] or 0), r["job"]))
+    only_baseline = sorted(base_labels[k] for k in base_labels.keys() - cand_labels.keys())
+    only_candidate = sorted(cand_labels[k] for k in cand_labels.keys() - base_labels.keys())
+    return rows, only_baseline, only_candidate
+
+
+def format_ms(time_ms):
+    return "-" if time_ms is None else f"{time_ms:.0f}"
+
+
+def report(rows, only_baseline, only_candidate):
+    width = max([len(r["job"]) for r in rows] + [3])
+    print(f"{'job':<{width}} {'baseline':>10} {'candidate':>10} "
+          f"{'speedup':>8} {'p':>7}  verdict")
+    for row in rows:
+        speedup = "-" if row["change"] is None else f"{1 / (1 + row['change']):.2f}x"
+        p = "-" if row["p"] is None else f"{row['p']:.3f}"
+        icon = ("🔴" if row["verdict"].startswith("regression") else
+                "🟢" if row["verdict"].startswith(("faster", "fixed"))
+                and "not significant" not in row["verdict"] else "⚪")
+        print(f"{row['job']:<{width}} {format_ms(row['baseline_ms']):>10} "
+              f"{format_ms(row['candidate_ms']):>10} {speedup:>8} {p:>7}  "
+              f"{icon} {row['verdict']}")
+
+    for title, jobs in (("Only in the baseline", only_baseline),
+                        ("Only in the candidate", only_candidate)):
+        if jobs:
+            print(f"\n{title}:")
+            for job in jobs:
+                print(f"  {job}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the runs of two results stores and flag regressions")
+    parser.add_argument("baseline", help="results store of the baseline")
+    parser.add_argument("candidate", help="results store of the candidate")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="median slowdown, as a fraction, above which a significant "
+        "change is a regression")
+    parser.add_argument("--alpha",
+                        type=float,
+                        default=0.05,
+                        help="significance level of the Mann-Whitney U test")
+    parser.add_argument(
+        "--small-sample-threshold",
+        type=float,
+        default=0.5,
+        help="median change, as a fraction, that counts when a job has too "
+        "few runs for the test to reach --alpha, provided the runs of the "
+        "two stores do not overlap")
+    args = parser.parse_args()
+
+    rows, only_baseline, only_candidate = compare(load_results(args.baseline),
+                                                  load_results(args.candidate),
+                                                  args.threshold, args.alpha,
+                                                  args.small_sample_threshold)
+    report(rows, only_baseline, only_candidate)
+
+    small = [r for r in rows if r["small_sample"]]
+    if small:
+        runs = next(k for k in itertools.count(2) if smallest_p(k, k) <= args.alpha)
+        print(f"\n⚠️  {len(small)} of {len(rows)} jobs have too few runs for "
+              f"any p-value to reach alpha={args.alpha}; they only count as "
+              f"changed when the runs do not overlap and the median moved by "
+              f"more than {args.small_sample_threshold:.0%}. Measure with "
+              f"--runs {runs} or more for the significance test.")
+
+    regressions = [r for r in rows if r["verdict"].startswith("regression")]
+    print(f"\n{len(rows)} jobs compared, {len(regressions)} regressions")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env nix-shell
+#!nix-shell -i python -p "python3.withPackages(ps: with ps; [ jpype1 ])"
+
+import argparse
+import collections
+import multiprocessing
+import os
+import queue
+import runpy
+import statistics
+import sys
+import time
+
+import alloy_to_tla_config
+from alloy_to_tla_config import SHARED_DIR, load_classes
+from runner import make_job, stream_jobs
+from scaling import parse_workers, workers_option
+from tlc_profiles import add_profile_arguments, load_profiles, profile_metadir, profile_options, profile_record, select_profile, tlc_command
+from results import DEFAULT_RESULTS_FILE, append_result, completed_runs, config_hash, job_key, load_results, new_sweep_id, samples_by
+
+
+def produce(template, generator_args, config_queue):
+    """Producer process: run a config template with the queue sink.
+
+    Templates call run() when loaded, so the template is executed as a
+    script with the queue handed over through alloy_to_tla_config. The
+    configs are also packed, so benchmark.py finds them afterwards.
+    """
+    alloy_to_tla_config.pipeline_queue = config_queue
+    sys.argv = [template, *generator_args, "--sink", "queue",
+                "--layout", "packed"]
+    runpy.run_path(template, run_name="__main__")
+
+
+def config_jobs(item, n, worker_counts, runs, profile_name, profile, fields):
+    """The TLC jobs of one config received from the producer.
+
+    Records, job keys and config hashes are those benchmark.py computes
+    for the same packed config, so its later sweeps skip these runs. The
+    multiplicity is only known once enumeration is over; it is filled in
+    when the run is stored, see main.
+    """
+    config_path, files, metadata = item
+    config_dir, tla_dir = os.path.split(config_path)
+    shared_path = os.path.join(config_dir, SHARED_DIR)
+    tla_config = next(f for f in [*os.listdir(shared_path), *files]
+                      if f.endswith(".cfg"))
+    tla_file = os.path.splitext(tla_config)[0] + ".tla"
+    inputs = [
+        os.path.join(shared_path, f) for f in os.listdir(shared_path)
+        if f.endswith((".tla", ".cfg")) and f not in files
+    ]
+    jobs = []
+    for workers in worker_counts:
+        command = f"{tlc_command(tla_file, tla_config, profile)} {workers_option(workers)}"
+        record = {
+            **fields,
+            "config_dir": config_dir,
+            "tla_config": tla_dir,
+            "n": n,
+            "tool": "tlc",
+            "job_key": job_key("tlc", profile_options(command, profile),
+                               inputs, texts=files),
+            "config_hash": config_hash(inputs, files),
+            "multiplicity": 1,
+            "workers": workers,
+            **profile_record(profile_name, profile),
+        }
+        jobs.extend(
+            make_job(command, "tlc", shared_path, {
+                **record, "repetition": i
+            }, profile_metadir(record), files) for i in range(runs))
+    return jobs
+
+
+def report_totals(records, config_dir):
+    """Print the total TLC time of every worker count, as benchmark.py adds it.
+
+    Medians are weighted by the multiplicities the producer wrote to the
+    classes file once enumeration was over.
+    """
+    multiplicities = {
+        d: c["multiplicity"] for d, c in load_classes(config_dir).items()
+    }
+    totals = collections.defaultdict(float)
+    for (tla_dir, workers), times in samples_by(records, "tla_config",
+                                                "workers",
+                                                version="job_key").items():
+        totals[workers] += statistics.median(times) * multiplicities.get(
+            tla_dir, 1)
+    for workers, total in sorted(totals.items()):
+        print(f"⏱️  TLC total with {workers} workers: {total:.0f} ms "
+              f"({total / 1000:.3f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Enumerate the configs of one N with a config template "
+        "and check them with TLC while enumeration is still running. Run it "
+        "from the spec directory, like the template.")
+    parser.add_argument("template", help="config template, e.g. Echo_config_template.py")
+    parser.add_argument("alloy_file_path")
+    parser.add_argument("n", type=int)
+    parser.add_argument("--dedup",
+                        action="store_true",
+                        help="check one config per isomorphism class")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=1,
+                        help="number of TLC runs at once")
+    parser.add_argument("--cores-per-job",
+                        type=int,
+                        default=None,
+                        help="pin each TLC run to its own set of this many CPUs")
+    parser.add_argument("--queue-size",
+                        type=int,
+                        default=64,
+                        help="configs enumerated ahead of the TLC workers at "
+                        "most; enumeration waits while the queue is full")
+    parser.add_argument("--runs",
+                        type=int,
+                        default=1,
+                        help="repetitions of every TLC run")
+    parser.add_argument("--timeout",
+                        type=float,
+                        default=None,
+                        help="wall-clock limit per TLC run, in seconds")
+    parser.add_argument("--tlc-workers",
+                        type=parse_workers,
+                        default=[1],
+                        metavar="N,N,...",
+                        help="run every config with each of these -workers counts")
+    add_profile_arguments(parser)
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE,
+                        help="JSON-lines file every run is appended to")
+    parser.add_argument("--rerun",
+                        action="store_true",
+                        help="measure configs already in the results store again")
+    args = parser.parse_args()
+
+    spec = os.path.basename(os.getcwd())
+    profile_name, profile = select_profile(load_profiles(args.tlc_profiles),
+                                           spec, args.n, args.tlc_profile)
+    fields = {"sweep": new_sweep_id(), "spec": spec}
+    done = set()
+    if os.path.exists(args.results) and not args.rerun:
+        done = completed_runs(load_results(args.results))
+
+    generator_args = [args.alloy_file_path, str(args.n)]
+    if args.dedup:
+        generator_args.append("--dedup")
+
+    # Forked, so the producer shares alloy_to_tla_config with this process;
+    # it starts the only JVM
+    context = multiprocessing.get_context("fork")
+    config_queue = context.Queue(maxsize=args.queue_size)
+    producer = context.Process(target=produce,
+                               args=(args.template, generator_args,
+                                     config_queue))
+    start = time.perf_counter()
+    producer.start()
+
+    pending = collections.deque()
+    progress = {"configs": 0, "skipped": 0, "enumerated": None,
+                "config_dir": None}
+
+    def get_job():
+        """Next TLC job, blocking until the producer has a config ready."""
+        while not pending:
+            if progress["enumerated"] is not None:
+                return None
+            try:
+                item = config_queue.get(timeout=1)
+            except queue.Empty:
+                if not producer.is_alive() and config_queue.empty():
+                    # The producer failed before closing the queue
+                    progress["enumerated"] = time.perf_counter() - start
+                continue
+            if item is None:
+                progress["enumerated"] = time.perf_counter() - start
+                print(f"\n🧮 Enumeration finished after "
+                      f"{progress['enumerated']:.1f} s, "
+                      f"{progress['configs']} configs")
+                continue
+            progress["configs"] += 1
+            progress["config_dir"] = os.path.dirname(item[0])
+            for job in config_jobs(item, args.n, args.tlc_workers, args.runs,
+                                   profile_name, profile, fields):
+                key = (job["record"]["job_key"], job["record"]["repetition"])
+                if key in done:
+                    progress["skipped"] += 1
+                else:
+                    pending.append(job)
+        return pending.popleft()
+
+    # Runs finished while the producer still enumerates wait here, since
+    # their class may still grow; the classes file is final once it exited
+    held = []
+    classes = {}
+
+    def store_held():
+        for record in held:
+            config_dir = record["config_dir"]
+            if config_dir not in classes:
+                classes[config_dir] = load_classes(config_dir)
+            entry = classes[config_dir].get(record["tla_config"])
+            if entry is not None:
+                record["multiplicity"] = entry["multiplicity"]
+            append_result(args.results, record)
+        held.clear()
+
+    def save_run(job, run):
+        held.append({**job["record"], **run})
+        if not producer.is_alive():
+            store_held()
+
+    try:
+        count = stream_jobs(get_job,
+                            limit=args.jobs,
+                            timeout=args.timeout,
+                            cores_per_job=args.cores_per_job if args.jobs > 1 else None,
+                            on_result=save_run)
+        producer.join()
+    finally:
+        # Without a classes file (the producer failed) runs count once
+        store_held()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✅ {count} TLC runs of {progress['configs']} configs in "
+          f"{elapsed:.1f} s ({progress['skipped']} already in {args.results}), "
+          f"enumeration took {progress['enumerated'] or 0:.1f} s")
+    if producer.exitcode:
+        print(f"⚠️  The producer exited with status {producer.exitcode}")
+    if progress["config_dir"] is not None and os.path.exists(args.results):
+        records = [
+            r for r in load_results(args.results)
+            if r.get("config_dir") == progress["config_dir"]
+            and r.get("tool") == "tlc"
+        ]
+        report_totals(records, progress["config_dir"])
+
+
+if __name__ == "__main__":
+    main()
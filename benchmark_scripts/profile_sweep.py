@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from results import DEFAULT_RESULTS_FILE, latest_records, load_results, samples_by
+
+
+def variant(record):
+    """What a TLC run measured: spec, N, profile, workers and config."""
+    config = record.get("config_hash")
+    if config is None:
+        config = (record.get("config_dir"), record.get("tla_config"),
+                  record.get("subrun"))
+    return (record.get("spec"), record.get("n"),
+            record.get("tlc_profile") or "default", record.get("workers") or 1,
+            config)
+
+
+def profile_totals(records):
+    """Total TLC time of every profile at every spec, N and worker count.
+
+    The total adds the median time of each config, weighted by its
+    multiplicity. Returns {(spec, n, workers): {profile: total_ms}}, the
+    total being None when the profile failed or skipped a config that
+    another profile measured.
+    """
+    records = [
+        dict(r, variant=variant(r)) for r in records
+        # The state-counting runs of --single-run are not timed
+        if r.get("tool") == "tlc" and "states_by_config" not in r
+    ]
+    hashed = [r for r in records if "job_key" in r]
+    plain = [r for r in records if "job_key" not in r]
+
+    medians = {}
+    multiplicities = {}
+    for group, version in ((hashed, "job_key"), (plain, "sweep")):
+        for key, times in samples_by(group, "variant", version=version).items():
+            medians[key[0]] = statistics.median(times)
+        for record in latest_records(group, "variant", version=version):
+            multiplicities[record["variant"]] = record.get("multiplicity", 1)
+
+    configs = {}
+    for spec, n, profile, workers, config in multiplicities:
+        configs.setdefault((spec, n, workers), {}).setdefault(profile, set()).add(config)
+
+    totals = {}
+    for (spec, n, workers), by_profile in configs.items():
+        every_config = set().union(*by_profile.values())
+        for profile in by_profile:
+            keys = [(spec, n, profile, workers, c) for c in every_config]
+            if all(key in medians for key in keys):
+                total = sum(medians[key] * multiplicities[key] for key in keys)
+            else:
+                total = None
+            totals.setdefault((spec, n, workers), {})[profile] = total
+    return totals
+
+
+def report(totals):
+    """Print every profile's total and the fastest one at each N."""
+    print(f"{'spec':<20} {'N':>4} {'workers':>8} {'profile':<16} {'total ms':>10}")
+    for (spec, n, workers), by_profile in sorted(totals.items(),
+                                                 key=lambda item: str(item[0])):
+        measured = {p: t for p, t in by_profile.items() if t is not None}
+        fastest = min(measured, key=measured.get) if measured else None
+        for profile, total in sorted(by_profile.items()):
+            time = "incomplete" if total is None else f"{total:.0f}"
+            mark = " 🏆" if profile == fastest and len(by_profile) > 1 else ""
+            print(f"{spec or '?':<20} {n:>4} {workers:>8} {profile:<16} "
+                  f"{time:>10}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a benchmark script once per TLC tuning profile and "
+        "report the fastest profile at each N")
+    parser.add_argument("--profiles",
+                        required=True,
+                        help="comma-separated profile names, e.g. "
+                        "default,parallel-gc,tmpfs")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE,
+                        help="JSON-lines file every run is appended to")
+    parser.add_argument("--report-only",
+                        action="store_true",
+                        help="only report on the runs already in the results store")
+    parser.add_argument("script", help="benchmark script to run, e.g. benchmark_echo.py")
+    parser.add_argument("script_args",
+                        nargs=argparse.REMAINDER,
+                        help="arguments passed on to the script")
+    args = parser.parse_args()
+
+    if not args.report_only:
+        for name in args.profiles.split(","):
+            print(f"\n⚙️ TLC profile {name}")
+            subprocess.run([
+                sys.executable, args.script, *args.script_args,
+                "--tlc-profile", name, "--results", args.results
+            ], check=True)
+
+    if not os.path.exists(args.results):
+        sys.exit(f"No results store at {args.results}")
+    report(profile_totals(load_results(args.results)))
+
+
+if __name__ == "__main__":
+    main()
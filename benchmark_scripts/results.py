@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import platform
+import socket
+import time
+
+# Default JSON-lines file every benchmark script appends its runs to
+DEFAULT_RESULTS_FILE = "results.jsonl"
+
+
+def host_info():
+    """Describe the machine a run was measured on."""
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def append_result(path, record):
+    """Append one run to the results store, stamped with time and host."""
+    record = dict(record)
+    record.setdefault("timestamp", time.time())
+    record.setdefault("host", host_info())
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def load_results(path):
+    """Read every run from a results store, in the order they were appended."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def new_sweep_id():
+    """Identify one invocation of a benchmark script within the store."""
+    return time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+
+
+def input_contents(input_files, texts=None):
+    """(name, bytes) of every model input, sorted by name.
+
+    texts maps file names to the contents of inputs that only exist in
+    memory, e.g. configs read from a packed archive; they are hashed
+    exactly like files of the same name, so a config gets the same key
+    whatever layout it was generated in.
+    """
+    contents = []
+    for path in input_files:
+        with open(path, "rb") as f:
+            contents.append((os.path.basename(path), f.read()))
+    for name, text in (texts or {}).items():
+        contents.append((name, text.encode()))
+    return sorted(contents, key=lambda item: item[0])
+
+
+def job_key(tool, options, input_files, runner_files=(), texts=None):
+    """Content hash identifying a measurement job.
+
+    The key covers the tool, its options and the contents of the model
+    inputs and the runner, so a job is re-measured exactly when one of
+    them changes. texts are in-memory inputs, see input_contents.
+    """
+    h = hashlib.sha256()
+    h.update(f"{tool}\0{options}\0".encode())
+    for label, contents in (("input", input_contents(input_files, texts)),
+                            ("runner", input_contents(runner_files))):
+        for name, data in contents:
+            h.update(f"{label}\0{name}\0".encode())
+            h.update(data)
+    return h.hexdigest()
+
+
+def config_hash(input_files, texts=None):
+    """Content hash of the model inputs of a job alone.
+
+    Unlike job_key it leaves out the tool options and the runner, so the
+    same config can be matched across solver or runner changes.
+    """
+    h = hashlib.sha256()
+    for name, data in input_contents(input_files, texts):
+        h.update(f"{name}\0".encode())
+        h.update(data)
+    return h.hexdigest()
+
+
+def completed_runs(records):
+    """Set of (job_key, repetition) pairs already present in the store."""
+    return {(r["job_key"], r["repetition"]) for r in records if "job_key" in r}
+
+
+def latest_records(records, *fields, version="sweep"):
+    """Keep, for every value of the given fields, only the most recent version.
+
+    By default a version is a sweep: re-running a script appends a new
+    sweep to the store and this drops the runs it superseded so they are
+    not mixed in. With version="job_key" a version is a set of inputs, so
+    runs of a resumed sweep are combined with the ones before the restart.
+    """
+    latest = {}
+    for record in records:
+        key = tuple(record.get(field) for field in fields)
+        latest[key] = record.get(version)
+    return [
+        record for record in records if record.get(version) == latest[tuple(
+            record.get(field) for field in fields)]
+    ]
+
+
+def samples_by(records, *fields, version="sweep", field="samples_ms"):
+    """Group the time samples of successful runs by the given record fields.
+
+    Returns a dict mapping tuples of field values to the samples of the
+    most recent version (see latest_records), in repetition order. When a
+    repetition was recorded more than once, the last record wins. With
+    another field, e.g. "states_generated", its values are collected
+    instead, still only from successful runs.
+    """
+    runs = {}
+    for record in latest_records(records, *fields, version=version):
+        key = tuple(record.get(field) for field in fields)
+        runs.setdefault(key, {})[record.get("repetition", 0)] = record
+
+    samples = {}
+    for key, by_repetition in runs.items():
+        for repetition in sorted(by_repetition):
+            record = by_repetition[repetition]
+            if not record.get("samples_ms") or record.get(field) is None:
+                continue
+            values = record[field]
+            samples.setdefault(key, []).extend(
+                values if isinstance(values, list) else [values])
+    return samples
@@ -0,0 +1,442 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from alloy_daemon import AlloyDaemon
+from tlc_output import add_throughput, parse_tlc_line
+
+FINISHED_PATTERN = re.compile(r"Finished in (\d+)ms")
+ITERATION_PATTERN = re.compile(
+    r"Iteration \d+/\d+: translation (\d+)ms, solving (\d+)ms, total (\d+)ms"
+    r"(?:, solver (\S+))?")
+# Printed by `AlloyRunner --batch` after every model of the manifest
+RESULT_PATTERN = re.compile(r"^Result: (\{.*\})$")
+
+
+def add_solver_arguments(parser):
+    """Add the AlloyRunner solver options shared by the benchmark scripts."""
+    solver = parser.add_mutually_exclusive_group()
+    solver.add_argument("--alloy-solver",
+                        metavar="ID",
+                        help="SAT solver AlloyRunner uses, e.g. sat4j")
+    solver.add_argument(
+        "--alloy-portfolio",
+        metavar="ID,ID,...",
+        help="race these solvers in separate JVMs and keep the first answer")
+    parser.add_argument(
+        "--alloy-portfolio-grace",
+        type=int,
+        metavar="MS",
+        help="time portfolio losers may still take after the winner before "
+        "they are killed and restarted (AlloyRunner default: 1000)")
+
+
+def solver_options(args):
+    """AlloyRunner command line options selecting the solvers in args."""
+    if args.alloy_portfolio:
+        if args.alloy_portfolio_grace is not None:
+            return (f"--portfolio {args.alloy_portfolio} "
+                    f"--portfolio-grace {args.alloy_portfolio_grace}")
+        return f"--portfolio {args.alloy_portfolio}"
+    if args.alloy_solver:
+        return f"--solver {args.alloy_solver}"
+    return ""
+
+
+def make_job(command, tool, working_dir=None, record=None, metadir_root=None,
+             files=None):
+    """Describe one checker run for run_jobs.
+
+    tool is "alloy" or "tlc"; record holds the fields stored with the run.
+    With a daemon, Alloy commands are the AlloyRunner arguments only.
+    metadir_root is where the TLC states directory of the run is created,
+    e.g. a tmpfs, instead of the system temporary directory. files
+    ({name: text}) are written over working_dir for this run only, see
+    stage_files.
+    """
+    return {
+        "command": command,
+        "tool": tool,
+        "working_dir": working_dir,
+        "record": record or {},
+        "metadir_root": metadir_root,
+        "files": files,
+    }
+
+
+def stage_files(working_dir, files):
+    """Temporary working directory with files laid over working_dir.
+
+    Every entry of working_dir is symlinked into the new directory and
+    files ({name: text}) are written next to them, replacing entries of
+    the same name. Configs read from a packed archive run this way
+    without a directory of their own on disk.
+    """
+    staged = tempfile.mkdtemp(prefix="config-")
+    for name in os.listdir(working_dir):
+        if name not in files:
+            os.symlink(os.path.abspath(os.path.join(working_dir, name)),
+                       os.path.join(staged, name))
+    for name, text in files.items():
+        with open(os.path.join(staged, name), "w") as f:
+            f.write(text)
+    return staged
+
+
+def parse_line(line, run):
+    """Update a run with whatever one line of checker output reports."""
+    match = FINISHED_PATTERN.search(line)
+    if match:
+        run["solver_time_ms"] = int(match.group(1))
+    match = ITERATION_PATTERN.search(line)
+    if match:
+        # Per measured iteration: time to translate to SAT and to solve
+        run.setdefault("translation_ms", []).append(int(match.group(1)))
+        run.setdefault("solving_ms", []).append(int(match.group(2)))
+        run["iterations_ms"].append(int(match.group(3)))
+        if match.group(4):
+            # With a portfolio, the solver that won this iteration
+            run.setdefault("solvers", []).append(match.group(4))
+    match = RESULT_PATTERN.match(line.strip())
+    if match:
+        run.setdefault("batch_results", []).append(json.loads(match.group(1)))
+    parse_tlc_line(line, run)
+
+
+def finish_run(run, start_time):
+    """Fill in wall time and samples once a run is over.
+
+    samples_ms holds one time per measured AlloyRunner iteration, or the
+    single "Finished in" time, and is empty when the run failed or timed
+    out. translation_ms and solving_ms split the iterations of successful
+    AlloyRunner runs.
+    """
+    run["wall_time_ms"] = (time.perf_counter() - start_time) * 1000
+    iterations = run.pop("iterations_ms")
+    if run["exit_status"] == "timeout":
+        run["solver_time_ms"] = None
+    if run["solver_time_ms"] is not None:
+        run["samples_ms"] = iterations or [run["solver_time_ms"]]
+    else:
+        run.pop("translation_ms", None)
+        run.pop("solving_ms", None)
+    add_throughput(run)
+    return run
+
+
+def new_run(command):
+    return {
+        "command": command,
+        "samples_ms": [],
+        "solver_time_ms": None,
+        "iterations_ms": [],
+        "exit_status": None,
+    }
+
+
+def rusage_fields(rusage):
+    """CPU times and peak RSS of a finished process as run fields."""
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return {
+        "cpu_user_ms": rusage.ru_utime * 1000,
+        "cpu_sys_ms": rusage.ru_stime * 1000,
+        "max_rss_kb": max_rss_kb,
+    }
+
+
+def daemon_usage(before, after):
+    """Resources a daemon request used, from usage() before and after it.
+
+    CPU times are the difference; the peak RSS is the JVM's since start.
+    """
+    if before is None or after is None:
+        return {}
+    return {
+        "cpu_user_ms": after["cpu_user_ms"] - before["cpu_user_ms"],
+        "cpu_sys_ms": after["cpu_sys_ms"] - before["cpu_sys_ms"],
+        "max_rss_kb": after["max_rss_kb"],
+    }
+
+
+def wait_process(process, run):
+    """Parse the output of a process until it ends, then reap it.
+
+    Runs in a thread. Reaping with wait4 rather than through asyncio gives
+    the resource usage of the process and of every descendant it waited
+    for, e.g. the JVM behind `tlc`.
+    """
+    for line in process.stdout:
+        parse_line(line, run)
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    process.stdout.close()
+    run.update(rusage_fields(rusage))
+    return process.returncode
+
+
+def kill_tree(process):
+    """Kill a checker and everything it spawned, e.g. the JVM behind `tlc`."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_process(command, working_dir=None, timeout=None, cores=None):
+    """Run a checker process, parsing its output as it streams in.
+
+    The timeout is a wall-clock limit on the whole run; on expiry or
+    cancellation the process group is killed. cores pins the process.
+    Besides the times, the run records the user and system CPU time and
+    the peak RSS of the process tree (see wait_process).
+    """
+    run = new_run(command)
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        command.split(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=working_dir,
+        text=True,
+        errors="replace",
+        start_new_session=True,
+        preexec_fn=(lambda: os.sched_setaffinity(0, cores)) if cores else None)
+    waiting = asyncio.ensure_future(
+        asyncio.to_thread(wait_process, process, run))
+
+    try:
+        run["exit_status"] = await asyncio.wait_for(asyncio.shield(waiting),
+                                                    timeout)
+    except asyncio.TimeoutError:
+        kill_tree(process)
+        await waiting
+        run["exit_status"] = "timeout"
+    except asyncio.CancelledError:
+        # The thread reaps the killed process on its own
+        kill_tree(process)
+        raise
+
+    return finish_run(run, start_time)
+
+
+async def run_daemon(daemon, command, working_dir=None, timeout=None):
+    """Send AlloyRunner arguments to a daemon; there is no exit status.
+
+    Resource usage is read from /proc where available, see daemon_usage.
+    A daemon that dies fails this run only, and a cancelled run kills the
+    daemon; either way it is restarted for the next run.
+    """
+    run = new_run(command)
+    start_time = time.perf_counter()
+    *options, alloy_file = command.split()
+    try:
+        before = daemon.usage()
+        output = await asyncio.to_thread(daemon.solve, alloy_file, working_dir,
+                                         timeout, options)
+        run.update(daemon_usage(before, daemon.usage()))
+        for line in output:
+            parse_line(line, run)
+    except subprocess.TimeoutExpired:
+        run["exit_status"] = "timeout"
+    except (RuntimeError, OSError) as e:
+        print(f"⚠️  {e}")
+        run["exit_status"] = "daemon exited"
+    except asyncio.CancelledError:
+        daemon.restart()
+        raise
+    return finish_run(run, start_time)
+
+
+def cpu_slots(n_slots, cores_per_job):
+    """Split the CPUs this process may use into n_slots disjoint core sets.
+
+    With too few CPUs for that, the jobs run unpinned (None slots).
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    if n_slots * cores_per_job > len(cpus):
+        print(f"⚠️  Cannot pin {n_slots} jobs x {cores_per_job} cores "
+              f"on {len(cpus)} available CPUs, running them unpinned; "
+              f"timings of concurrent jobs may interfere.")
+        return [None] * n_slots
+    return [
+        set(cpus[i * cores_per_job:(i + 1) * cores_per_job])
+        for i in range(n_slots)
+    ]
+
+
+async def run_job(job, slot, timeout, daemon_command):
+    # TLC runs sharing a working directory would collide on the default
+    # states/ directory, so every run gets its own metadir
+    command = job["command"]
+    metadir = None
+    if job["tool"] == "tlc":
+        metadir = tempfile.mkdtemp(prefix="tlc-states-",
+                                   dir=job.get("metadir_root"))
+        command = f"{command} -metadir {metadir}"
+    working_dir = job["working_dir"]
+    staged = None
+    if job.get("files"):
+        staged = working_dir = stage_files(working_dir, job["files"])
+
+    try:
+        if job["tool"] == "alloy" and (daemon_command or slot["daemon"]):
+            if slot["daemon"] is None:
+                slot["daemon"] = AlloyDaemon(*daemon_command,
+                                             cores=slot["cores"])
+            return await run_daemon(slot["daemon"], job["command"],
+                                    working_dir, timeout)
+        return await run_process(command, working_dir, timeout,
+                                 slot["cores"])
+    finally:
+        if metadir is not None:
+            shutil.rmtree(metadir, ignore_errors=True)
+        if staged is not None:
+            shutil.rmtree(staged, ignore_errors=True)
+
+
+async def run_jobs_async(jobs,
+                         limit=1,
+                         timeout=None,
+                         cores_per_job=None,
+                         daemon_command=None,
+                         on_result=None,
+                         daemons=None):
+    slots = asyncio.Queue()
+    cores = cpu_slots(limit, cores_per_job) if cores_per_job else [None] * limit
+    for i, slot_cores in enumerate(cores):
+        slots.put_nowait({
+            "cores": slot_cores,
+            "daemon": daemons[i] if daemons else None,
+            "owned": not daemons,
+        })
+
+    async def run_one(i, job):
+        slot = await slots.get()
+        try:
+            print(f"\n▶️  Run '{job['command']}' ({i + 1}/{len(jobs)}) "
+                  f"(workdir={job['working_dir']})")
+            run = await run_job(job, slot, timeout, daemon_command)
+        finally:
+            slots.put_nowait(slot)
+        report(run)
+        if on_result is not None:
+            on_result(job, run)
+        return run
+
+    tasks = [asyncio.create_task(run_one(i, job)) for i, job in enumerate(jobs)]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        while not slots.empty():
+            slot = slots.get_nowait()
+            if slot["daemon"] is not None and slot["owned"]:
+                slot["daemon"].close()
+
+
+def report(run):
+    if run["exit_status"] == "timeout":
+        print("Timeout expired!")
+        if "states_generated" in run:
+            print(f"Partial progress: {run['states_generated']} states generated, "
+                  f"{run.get('distinct_states')} distinct states found")
+    if run["solver_time_ms"] is not None:
+        time_ms = run["solver_time_ms"]
+        print(f"\n✔️  Model checking time: {time_ms} ms ({time_ms / 1000:.3f} s)")
+    else:
+        print("⚠️  Could not find 'Finished in ...ms' in output.")
+    if run.get("states_per_second") is not None:
+        print(f"📊 {run['states_generated']} states generated, "
+              f"{run['distinct_states']} distinct, depth {run.get('depth')}, "
+              f"{run['states_per_second']:.0f} states/s")
+    if run.get("max_rss_kb") is not None:
+        print(f"🧠 Peak RSS {run['max_rss_kb'] / 1024:.0f} MB, CPU user "
+              f"{run['cpu_user_ms'] / 1000:.3f} s, sys {run['cpu_sys_ms'] / 1000:.3f} s")
+
+
+def run_jobs(jobs,
+             limit=1,
+             timeout=None,
+             cores_per_job=None,
+             daemon_command=None,
+             on_result=None,
+             daemons=None):
+    """Run checker jobs concurrently and return their runs in job order.
+
+    At most limit jobs run at once, each optionally pinned to its own
+    cores_per_job CPUs. Every tool gets the same treatment: output is
+    streamed into the parsers, timeout (seconds) is a wall-clock limit per
+    run, and a failed or timed-out run has empty samples_ms instead of
+    stopping the others. Alloy jobs go to one AlloyDaemon per slot when
+    daemon_command (jar, runner) is given; callers running several batches
+    can instead pass one long-lived daemon per slot in daemons, which are
+    then left open. on_result(job, run) is called as each run completes,
+    e.g. to append it to the results store.
+    """
+    return asyncio.run(
+        run_jobs_async(jobs, limit, timeout, cores_per_job, daemon_command,
+                       on_result, daemons))
+
+
+async def stream_jobs_async(get_job, limit, timeout, cores_per_job, on_result):
+    slots = asyncio.Queue()
+    cores = cpu_slots(limit, cores_per_job) if cores_per_job else [None] * limit
+    for slot_cores in cores:
+        slots.put_nowait({"cores": slot_cores, "daemon": None, "owned": True})
+
+    async def run_one(i, job, slot):
+        try:
+            print(f"\n▶️  Run '{job['command']}' ({i + 1}) "
+                  f"(workdir={job['working_dir']})")
+            run = await run_job(job, slot, timeout, None)
+        finally:
+            slots.put_nowait(slot)
+        report(run)
+        if on_result is not None:
+            on_result(job, run)
+
+    running = set()
+    count = 0
+    try:
+        while True:
+            # Only ask for a job once a slot is free, so a producer
+            # feeding get_job from a bounded queue blocks instead of
+            # running ahead
+            slot = await slots.get()
+            job = await asyncio.to_thread(get_job)
+            if job is None:
+                slots.put_nowait(slot)
+                break
+            task = asyncio.create_task(run_one(count, job, slot))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            count += 1
+        if running:
+            await asyncio.gather(*running)
+    finally:
+        for task in running:
+            task.cancel()
+    return count
+
+
+def stream_jobs(get_job, limit=1, timeout=None, cores_per_job=None,
+                on_result=None):
+    """Run jobs as get_job() hands them over, until it returns None.
+
+    Like run_jobs, but the jobs need not be known in advance: get_job is
+    called from a thread whenever a slot is free and may block, e.g. on a
+    queue filled by another process. Runs are only passed to
+    on_result(job, run), not kept, so memory does not grow with the
+    number of jobs. Returns how many jobs were run.
+    """
+    return asyncio.run(
+        stream_jobs_async(get_job, limit, timeout, cores_per_job, on_result))
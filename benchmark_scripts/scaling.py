@@ -0,0 +1,118 @@
+import argparse
+
+from sweep import median_total
+
+
+def parse_workers(text):
+    """Worker counts from a comma-separated list such as "1,2,4,8"."""
+    try:
+        counts = sorted({int(w) for w in text.split(",")})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a list of worker counts: {text}")
+    if counts[0] < 1:
+        raise argparse.ArgumentTypeError("worker counts must be at least 1")
+    return counts
+
+
+def add_worker_arguments(parser):
+    """Add the TLC worker-count options shared by the benchmark scripts."""
+    parser.add_argument(
+        "--tlc-workers",
+        type=parse_workers,
+        default=[1],
+        metavar="N,N,...",
+        help="run every TLC job with each of these -workers counts, e.g. "
+        "1,2,4,8, and plot the speedup")
+    parser.add_argument(
+        "--best-workers",
+        action="store_true",
+        help="compare Alloy with TLC at its fastest worker count for each N "
+        "instead of the smallest count")
+
+
+def workers_option(workers):
+    """TLC command line option running a model with the given workers."""
+    return f"-workers {workers}"
+
+
+def select_workers(by_workers, best=False):
+    """Pick the TLC times the comparison with Alloy uses.
+
+    by_workers maps worker counts to time components (see
+    stats.summarize). Returns (workers, components): the smallest count,
+    or with best the one with the lowest median total, among the counts
+    that succeeded.
+    """
+    if not by_workers:
+        return None, []
+    if not best:
+        workers = min(by_workers)
+        return workers, by_workers[workers]
+    measured = [w for w, components in by_workers.items() if components]
+    if not measured:
+        return None, []
+    workers = min(measured, key=lambda w: median_total(by_workers[w]))
+    return workers, by_workers[workers]
+
+
+def scaling_curve(by_workers):
+    """Speedup and parallel efficiency of TLC at every worker count.
+
+    Both are relative to the smallest count measured, normally 1 worker:
+    speedup is the ratio of median total times and efficiency is the
+    speedup divided by the increase in workers. Returns a list of
+    (workers, speedup, efficiency), empty with fewer than two counts.
+    """
+    measured = sorted(w for w, components in by_workers.items() if components)
+    if len(measured) < 2:
+        return []
+    base = measured[0]
+    base_time = median_total(by_workers[base])
+    curve = []
+    for workers in measured:
+        speedup = base_time / median_total(by_workers[workers])
+        curve.append((workers, speedup, speedup * base / workers))
+    return curve
+
+
+def report_scaling(scaling_times):
+    """Print the scaling curve of every N in {N: {workers: components}}."""
+    print("\n🧵 TLC worker scaling")
+    print(f"{'N':>4} {'workers':>8} {'speedup':>8} {'efficiency':>11}")
+    for n, by_workers in sorted(scaling_times.items()):
+        for workers, speedup, efficiency in scaling_curve(by_workers):
+            print(f"{n:>4} {workers:>8} {speedup:>7.2f}x {efficiency:>10.0%}")
+
+
+def plot_scaling(scaling_times, title, path):
+    """Plot speedup and parallel efficiency against workers, one line per N."""
+    import matplotlib.pyplot as plt
+
+    fig, (speedup_ax, efficiency_ax) = plt.subplots(1, 2, figsize=(12, 5))
+    all_workers = set()
+    for n, by_workers in sorted(scaling_times.items()):
+        curve = scaling_curve(by_workers)
+        if not curve:
+            continue
+        workers, speedups, efficiencies = zip(*curve)
+        all_workers.update(workers)
+        speedup_ax.plot(workers, speedups, marker='o', label=f"N = {n}")
+        efficiency_ax.plot(workers, efficiencies, marker='o', label=f"N = {n}")
+
+    if all_workers:
+        workers = sorted(all_workers)
+        speedup_ax.plot(workers, [w / workers[0] for w in workers],
+                        linestyle='--', color='gray', label='ideal')
+    speedup_ax.set_xlabel("TLC workers")
+    speedup_ax.set_ylabel("Speedup")
+    speedup_ax.legend()
+    speedup_ax.grid(True)
+    efficiency_ax.set_xlabel("TLC workers")
+    efficiency_ax.set_ylabel("Parallel efficiency")
+    efficiency_ax.set_ylim(0, 1.1)
+    efficiency_ax.legend()
+    efficiency_ax.grid(True)
+
+    fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
@@ -0,0 +1,133 @@
+import math
+import random
+import statistics
+
+
+def add_stats_arguments(parser):
+    """Add the repetition and confidence options shared by the scripts."""
+    parser.add_argument("--runs", type=int, default=3,
+                        help="repetitions per measurement (the minimum with "
+                        "--ci-target)")
+    parser.add_argument(
+        "--ci-target",
+        type=float,
+        help="keep repeating until the confidence interval of the mean is "
+        "within this fraction of it, e.g. 0.05 for ±5%%")
+    parser.add_argument("--max-runs", type=int, default=20,
+                        help="repetition limit per measurement with --ci-target")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="confidence level of the bootstrap intervals")
+
+
+def quartiles(samples):
+    if len(samples) < 2:
+        return samples[0], samples[0]
+    q1, _, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+    return q1, q3
+
+
+def tukey_outliers(samples, k=1.5):
+    """Samples outside the Tukey fences [Q1 - k IQR, Q3 + k IQR]."""
+    q1, q3 = quartiles(samples)
+    iqr = q3 - q1
+    return [t for t in samples if t < q1 - k * iqr or t > q3 + k * iqr]
+
+
+def bootstrap_ci(components, confidence=0.95, resamples=2000, seed=0):
+    """Bootstrap confidence interval of the sum of the component means.
+
+    Each component is resampled on its own, so components measured
+    independently, such as the TLC runs of different sub-configs, may have
+    any number of repetitions. The seed keeps reports reproducible.
+    """
+    rng = random.Random(seed)
+    totals = sorted(
+        sum(statistics.fmean(rng.choices(c, k=len(c))) for c in components)
+        for _ in range(resamples))
+    alpha = (1 - confidence) / 2
+    return (totals[int(alpha * (resamples - 1))],
+            totals[math.ceil((1 - alpha) * (resamples - 1))])
+
+
+def summarize(components, confidence=0.95):
+    """Summarize a time that is the sum of independently measured parts.
+
+    components is a list of sample lists, one per part; a plain
+    measurement is a single component. The mean and its bootstrap CI are
+    those of the total, and its stdev adds the part variances instead of
+    adding samples up by repetition index. Median, quartiles and IQR
+    describe a single component; for several, the median is the sum of
+    their medians and the quartiles are left out. Outliers are counted by
+    Tukey's rule within each component and only flagged, never dropped.
+    Returns None if any part has no samples.
+    """
+    if not components or not all(components):
+        return None
+
+    summary = {
+        "runs": min(len(c) for c in components),
+        "mean": sum(statistics.fmean(c) for c in components),
+        "stdev": math.sqrt(sum(statistics.variance(c) for c in components
+                               if len(c) > 1)),
+        "median": sum(statistics.median(c) for c in components),
+        "q1": None,
+        "q3": None,
+        "iqr": None,
+        "outliers": sum(len(tukey_outliers(c)) for c in components),
+    }
+    if len(components) == 1:
+        summary["q1"], summary["q3"] = quartiles(components[0])
+        summary["iqr"] = summary["q3"] - summary["q1"]
+    summary["ci_low"], summary["ci_high"] = bootstrap_ci(components, confidence)
+    return summary
+
+
+def precise_enough(samples, ci_target, confidence=0.95):
+    """True if the CI of the mean is within ci_target of the mean."""
+    if len(samples) < 2:
+        return False
+    low, high = bootstrap_ci([samples], confidence)
+    mean = statistics.fmean(samples)
+    return mean > 0 and (high - low) / 2 <= ci_target * mean
+
+
+def more_runs(samples, args, runs_done, batch=1):
+    """How many more repetitions a measurement needs under --ci-target.
+
+    At most batch are asked for at once, e.g. one per parallel job, and
+    never more than --max-runs in total. Failed measurements, with no
+    samples, are not repeated.
+    """
+    if args.ci_target is None or not samples or runs_done >= args.max_runs:
+        return 0
+    if precise_enough(samples, args.ci_target, args.confidence):
+        return 0
+    return min(batch, args.max_runs - runs_done)
+
+
+def mean_and_stdev(summary):
+    """Bar height and error bar of a summary, zero when nothing succeeded."""
+    if summary is None:
+        return 0, 0
+    return summary["mean"], summary["stdev"]
+
+
+def runs_label(args):
+    """How many runs each measurement took, for plot titles."""
+    if args.ci_target is None:
+        return f"{args.runs} runs per measurement"
+    return f"{args.runs}–{args.max_runs} runs per measurement"
+
+
+def format_summary(summary, confidence=0.95):
+    if summary is None:
+        return "no successful runs"
+    text = f"median {summary['median']:.0f} ms"
+    if summary["iqr"] is not None:
+        text += f" (IQR {summary['q1']:.0f}–{summary['q3']:.0f})"
+    text += (f", mean {summary['mean']:.0f} ± {summary['stdev']:.0f} ms, "
+             f"{confidence:.0%} CI [{summary['ci_low']:.0f}, "
+             f"{summary['ci_high']:.0f}], {summary['runs']} runs")
+    if summary["outliers"]:
+        text += f", ⚠️  {summary['outliers']} outlier(s)"
+    return text
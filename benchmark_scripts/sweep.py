@@ -0,0 +1,192 @@
+import math
+import statistics
+import sys
+
+
+def add_sweep_arguments(parser, adaptive=True):
+    """Add the sweep options shared by the benchmark scripts.
+
+    Scripts that measure configs generated beforehand only take --budget.
+    """
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="per-run time budget in seconds; a tool with a run whose median "
+        "time at some N exceeds it is not run for larger N")
+    if not adaptive:
+        return
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="grow N from --start-n until every tool exceeds --budget "
+        "(or --max-n is reached) instead of using the script's N values")
+    parser.add_argument("--start-n", type=int, default=1,
+                        help="first N of an adaptive sweep")
+    parser.add_argument("--growth",
+                        choices=["linear", "geometric"],
+                        default="linear",
+                        help="how an adaptive sweep grows N")
+    parser.add_argument("--step", type=int, default=1,
+                        help="increment of N for --growth linear")
+    parser.add_argument("--factor", type=float, default=2.0,
+                        help="multiplier of N for --growth geometric")
+    parser.add_argument("--max-n", type=int,
+                        help="largest N an adaptive sweep may reach")
+
+
+def next_n(n, growth="linear", step=1, factor=2.0):
+    if growth == "geometric":
+        # Always make progress, even for factors close to 1
+        return max(n + 1, math.ceil(n * factor))
+    return n + step
+
+
+def n_sequence(start_n=1, growth="linear", step=1, factor=2.0, max_n=None):
+    """The N of an adaptive sweep, endless unless max_n is given."""
+    n = start_n
+    while max_n is None or n <= max_n:
+        yield n
+        n = next_n(n, growth, step, factor)
+
+
+def sweep_n_values(args, n_values):
+    """The N a script measures: its fixed list, or a growing sequence."""
+    if args.adaptive:
+        if args.budget is None and args.max_n is None:
+            sys.exit("--adaptive needs --budget or --max-n to stop")
+        return n_sequence(args.start_n, args.growth, args.step, args.factor,
+                          args.max_n)
+    return n_values
+
+
+def median_total(components):
+    """Median time of a total made of independently measured components."""
+    return sum(statistics.median(samples) for samples in components)
+
+
+def over_budget(components, budget_ms):
+    """True if a tool failed, timed out or one of its runs took too long.
+
+    components holds the samples of every run making up the tool's time
+    at some N, e.g. one per TLC config; the budget applies to each run.
+    """
+    return not components or any(
+        not samples or statistics.median(samples) > budget_ms
+        for samples in components)
+
+
+def budget_sweep(measure_n, tools, n_values, budget_ms=None):
+    """Measure every N in turn, dropping tools that went over budget.
+
+    measure_n(n, tools) measures the given tools at N and returns a dict
+    mapping each of them to its time components, one list of samples per
+    run making up the tool's time (see stats.summarize). Once a tool is over budget
+    at some N it is not run for any larger N, so hopeless sizes are never
+    attempted; the sweep ends when no tool is left. Returns a dict mapping
+    N to a dict of tool to components, with an empty list for tools that
+    were no longer measured.
+    """
+    active = list(tools)
+    times = {}
+    for n in n_values:
+        if not active:
+            break
+        tool_times = measure_n(n, active)
+        times[n] = {tool: tool_times.get(tool, []) for tool in tools}
+        if budget_ms is None:
+            continue
+        for tool in list(active):
+            if over_budget(times[n][tool], budget_ms):
+                print(f"⏹️  {tool} is over the {budget_ms / 1000:g} s budget "
+                      f"at N = {n}, not measuring larger N")
+                active.remove(tool)
+    return times
+
+
+def least_squares(xs, ys):
+    """Intercept, slope and sum of squared residuals of a line fit."""
+    x_mean = statistics.mean(xs)
+    y_mean = statistics.mean(ys)
+    sxx = sum((x - x_mean)**2 for x in xs)
+    slope = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sxx
+    intercept = y_mean - slope * x_mean
+    sse = sum((y - intercept - slope * x)**2 for x, y in zip(xs, ys))
+    return intercept, slope, sse
+
+
+def fit_growth(points):
+    """Fit time(N) with an exponential and a power law, keep the closer one.
+
+    points are (N, time_ms) pairs. Both models are linear in log time:
+    exponential is log t = a + b N and power is log t = a + b log N. The
+    fit with the smaller residual in log space is returned as a dict with
+    keys model, a, b and sse, or None with fewer than two usable points.
+    """
+    points = [(n, t) for n, t in points if n > 0 and t > 0]
+    if len(set(n for n, t in points)) < 2:
+        return None
+
+    log_times = [math.log(t) for n, t in points]
+    fits = []
+    for model, xs in (("exponential", [n for n, t in points]),
+                      ("power", [math.log(n) for n, t in points])):
+        a, b, sse = least_squares(xs, log_times)
+        fits.append({"model": model, "a": a, "b": b, "sse": sse})
+    return min(fits, key=lambda fit: fit["sse"])
+
+
+def predict(fit, n):
+    x = n if fit["model"] == "exponential" else math.log(n)
+    return math.exp(fit["a"] + fit["b"] * x)
+
+
+def limit_n(fit, budget_ms):
+    """Largest N the fit expects to finish within the budget, or None."""
+    if fit["b"] <= 0:
+        return None
+    x = (math.log(budget_ms) - fit["a"]) / fit["b"]
+    limit = x if fit["model"] == "exponential" else math.exp(x)
+    return math.floor(limit)
+
+
+def describe(fit):
+    if fit["model"] == "exponential":
+        return (f"t(N) ≈ {math.exp(fit['a']):.3g} ms × "
+                f"{math.exp(fit['b']):.3g}^N")
+    return f"t(N) ≈ {math.exp(fit['a']):.3g} ms × N^{fit['b']:.3g}"
+
+
+def growth_series(times):
+    """(N, median time) points of every tool from {N: (alloy, tlc)} times.
+
+    Each tool's times at N are its components, see over_budget.
+    """
+    return {
+        tool: [(n, median_total(tool_times[i]))
+               for n, tool_times in sorted(times.items()) if tool_times[i]]
+        for i, tool in enumerate(["alloy", "tlc"])
+    }
+
+
+def report_growth(series, budget_ms=None):
+    """Fit and print the growth curve of every tool.
+
+    series maps a tool to its (N, time_ms) points. Returns a dict mapping
+    each tool to its fit (None if it could not be fitted).
+    """
+    fits = {}
+    print("\n📐 Growth curves")
+    for tool, points in series.items():
+        fit = fit_growth(points)
+        fits[tool] = fit
+        if fit is None:
+            print(f"{tool}: not enough points to fit")
+            continue
+        line = f"{tool}: {fit['model']}, {describe(fit)}"
+        if budget_ms is not None:
+            limit = limit_n(fit, budget_ms)
+            if limit is not None:
+                line += (f", expected to stay within the {budget_ms / 1000:g} s "
+                         f"budget up to N = {limit}")
+        print(line)
+    return fits
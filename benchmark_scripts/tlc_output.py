@@ -0,0 +1,92 @@
+import re
+import statistics
+
+from results import samples_by
+
+# `tlc -tool` wraps every message in these lines, tagged code:severity
+START_PATTERN = re.compile(r"@!@!@STARTMSG (\d+):(\d+) @!@!@")
+END_PATTERN = re.compile(r"@!@!@ENDMSG (\d+) @!@!@")
+
+# Message codes, see tlc2.output.EC in tla2tools.jar
+TLC_SEARCH_DEPTH = 2194
+TLC_STATS = 2199
+TLC_PROGRESS_STATS = 2200
+
+COUNTER_PATTERNS = {
+    "states_generated": re.compile(r"([\d,]+) states generated"),
+    "distinct_states": re.compile(r"([\d,]+) distinct states found"),
+    "queue_size": re.compile(r"([\d,]+) states left on queue"),
+}
+DEPTH_PATTERN = re.compile(r"state graph search is (\d+)")
+
+
+def parse_tlc_line(line, run):
+    """Update a run with one line of `tlc -tool` output.
+
+    Message bodies follow their STARTMSG line, so the code of the message
+    being read is kept in run["tlc_message"] until its ENDMSG. Progress
+    messages update the counters while TLC runs, which keeps partial
+    counts for runs that time out; the final statistics message
+    overwrites them.
+    """
+    match = START_PATTERN.search(line)
+    if match:
+        run["tlc_message"] = int(match.group(1))
+        return
+    if END_PATTERN.search(line):
+        run["tlc_message"] = None
+        return
+
+    code = run.get("tlc_message")
+    if code in (TLC_STATS, TLC_PROGRESS_STATS):
+        for field, pattern in COUNTER_PATTERNS.items():
+            match = pattern.search(line)
+            if match:
+                run[field] = int(match.group(1).replace(",", ""))
+    elif code == TLC_SEARCH_DEPTH:
+        match = DEPTH_PATTERN.search(line)
+        if match:
+            run["depth"] = int(match.group(1))
+
+
+def add_throughput(run):
+    """Store the states per second of a finished TLC run."""
+    run.pop("tlc_message", None)
+    if run.get("states_generated") is None or not run.get("solver_time_ms"):
+        return
+    seconds = run["solver_time_ms"] / 1000
+    run["states_per_second"] = run["states_generated"] / seconds
+    run["distinct_states_per_second"] = run["distinct_states"] / seconds
+
+
+def add_metric_argument(parser):
+    """Add the option choosing the y-axis of the comparison plot."""
+    parser.add_argument(
+        "--metric",
+        choices=["time", "throughput"],
+        default="time",
+        help="plot checking time, or TLC throughput in generated states "
+        "per second")
+
+
+def median_states(records, *fields, version="sweep"):
+    """Median states generated by the successful TLC runs of every key."""
+    states = {}
+    for key, values in samples_by(records, *fields, version=version,
+                                  field="states_generated").items():
+        states[key] = statistics.median(values)
+    return states
+
+
+def throughput(states, summary):
+    """TLC throughput of a total time and its error bar, in states/s.
+
+    states is the number of states generated by all the runs making up
+    the time summarized by summary (see stats.summarize); the error bar
+    scales with the relative stdev of the time.
+    """
+    if not states or summary is None or not summary["mean"]:
+        return 0, 0
+    value = states / (summary["mean"] / 1000)
+    return value, value * summary["stdev"] / summary["mean"]
+
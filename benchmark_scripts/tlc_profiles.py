@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_FILE = os.path.join(SCRIPT_DIR, "tlc_profiles.json")
+# Profiles with JVM settings run TLC from this jar instead of the `tlc`
+# wrapper, which does not let the JVM options be changed
+TLA2TOOLS_JAR = os.environ.get("TLA2TOOLS_JAR",
+                               os.path.join(SCRIPT_DIR, "tla2tools.jar"))
+JVM_SETTINGS = ("heap", "gc", "java_options")
+
+
+def add_profile_arguments(parser):
+    """Add the TLC tuning profile options shared by the benchmark scripts."""
+    parser.add_argument(
+        "--tlc-profile",
+        metavar="NAME",
+        help="TLC tuning profile for every run, overriding the per-spec and "
+        "per-N rules of the profiles file")
+    parser.add_argument("--tlc-profiles",
+                        default=PROFILES_FILE,
+                        metavar="PATH",
+                        help="JSON file of TLC tuning profiles and rules")
+
+
+def load_profiles(path=PROFILES_FILE):
+    """Read the profiles file: {"profiles": {name: settings}, "rules": [...]}.
+
+    The empty "default" profile runs the bare `tlc` wrapper as before.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    config.setdefault("rules", [])
+    config["profiles"].setdefault("default", {})
+    return config
+
+
+def select_profile(config, spec, n, name=None):
+    """Name and settings of the profile to check spec at N with.
+
+    An explicit name wins; otherwise the first rule whose spec, min_n and
+    max_n (each optional) match is used, and "default" if none does.
+    """
+    if name is None:
+        name = "default"
+        for rule in config["rules"]:
+            if (rule.get("spec", spec) == spec
+                    and rule.get("min_n", n) <= n <= rule.get("max_n", n)):
+                name = rule["profile"]
+                break
+    if name not in config["profiles"]:
+        sys.exit(f"Unknown TLC profile '{name}', expected one of "
+                 f"{', '.join(sorted(config['profiles']))}")
+    return name, config["profiles"][name]
+
+
+def tlc_command(tla_file, tla_config, profile):
+    """TLC command line checking tla_file with tla_config under a profile.
+
+    fpmem (fraction of memory for the fingerprint set) and fp (fingerprint
+    function) are TLC options; heap (-Xmx), gc (e.g. "ParallelGC" for
+    -XX:+UseParallelGC) and java_options need a JVM launched directly.
+    """
+    options = f"{tla_file} -tool -modelcheck -coverage 1 -config {tla_config}"
+    if "fpmem" in profile:
+        options += f" -fpmem {profile['fpmem']}"
+    if "fp" in profile:
+        options += f" -fp {profile['fp']}"
+    if not any(setting in profile for setting in JVM_SETTINGS):
+        return f"tlc {options}"
+
+    jvm_options = []
+    if "heap" in profile:
+        jvm_options.append(f"-Xmx{profile['heap']}")
+    if "gc" in profile:
+        jvm_options.append(f"-XX:+Use{profile['gc']}")
+    jvm_options.extend(profile.get("java_options", []))
+    return f"java {' '.join(jvm_options)} -cp {TLA2TOOLS_JAR} tlc2.TLC {options}"
+
+
+def profile_options(command, profile):
+    """Options identifying a TLC run under a profile, for its job key.
+
+    The command line carries every setting but metadir, which the runner
+    only adds when the run starts, so it is appended here.
+    """
+    if "metadir" in profile:
+        return f"{command} -metadir {profile['metadir']}"
+    return command
+
+
+def profile_record(name, profile):
+    """Fields recording the profile a TLC run used."""
+    return {"tlc_profile": name, "tlc_profile_settings": profile}
+
+
+def profile_metadir(record):
+    """Root of the TLC states directory the profile of a run asks for."""
+    return record.get("tlc_profile_settings", {}).get("metadir")
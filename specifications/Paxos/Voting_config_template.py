@@ -3,14 +3,24 @@
 
 import sys
 import os
-import re
 
 sys.path.append(os.path.abspath("../../benchmark_scripts"))
-from alloy_to_tla_config import edges_to_string, dict_values_to_string, list_to_unquoted_string, create_config_subdirectory, change_block_scope, get_object_index, run
+from alloy_to_tla_config import dict_values_to_string, list_to_unquoted_string, change_block_scope, canonical_set_family, find_field, relation_indices, solutions, run
 
 
 def alloy_run_template(n):
-    return f"run {{}} for exactly {n} Acceptor, exactly {n} Quorum, exactly 2 Value, 2 Ballot"
+    # Enough Int bitwidth for the membership counts in alloy_partitions
+    return f"run {{}} for exactly {n} Acceptor, exactly {n} Quorum, exactly 2 Value, 2 Ballot, {(n * n).bit_length() + 1} Int"
+
+
+def alloy_scopes(n):
+    return {"Acceptor": (n, True), "Quorum": (n, True)}
+
+
+def alloy_partitions(n):
+    # The total number of quorum memberships does not depend on atom
+    # names, so every instance lands in exactly one partition
+    return [f"#nodes = {k}" for k in range(n * n + 1)]
 
 
 def alloy_template(src, n):
@@ -42,52 +52,27 @@ def create_alloy_config(config_dir_prefix, alloy_file_path, alloy_file_name,
             dst.write(alloy_template(src.read(), n))
 
 
-def create_tla_config(config_dir_prefix, world, solution, n):
-    tla_config_file = "MCVoting.tla"
-    copy_list = ["Voting.tla", "TLAPS.tla", "MCVoting.cfg"]
+TLA_FILE = "MCVoting.tla"
+COPY_LIST = ["Voting.tla", "TLAPS.tla", "MCVoting.cfg"]
+
 
+def tla_instances(world, solution, n, dedup):
     acceptor_labels = ["a1", "a2", "a3", "a4"][:n]
 
-    index = 1
-    if solution.satisfiable():
-        while True:
-            quorum = {}
-            print(f"Instance {index} found. Predicate is consistent.")
-
-            for sig in world.getAllReachableSigs():
-                if str(sig) == "this/Quorum":
-                    fields = sig.getFields()
-                    for field in fields:
-                        if str(field.sig
-                               ) == "this/Quorum" and field.label == "nodes":
-                            ts = solution.eval(field)
-                            for t in ts:
-                                quorum_index = int(
-                                    re.search(r'.*?(\d+)$',
-                                              str(t.atom(0))).group(1))
-                                acceptor_index = int(
-                                    re.search(r'.*?(\d+)$',
-                                              str(t.atom(1))).group(1))
-
-                                if quorum_index not in quorum:
-                                    quorum[quorum_index] = []
-                                quorum[quorum_index].append(acceptor_index)
-
-            config_dir = create_config_subdirectory(config_dir_prefix, index, copy_list)
-            print(f"Created config directory: {config_dir}")
-
-            output_filename = os.path.join(config_dir,
-                                            f"{tla_config_file}")
-            with open(output_filename, 'w') as f:
-                f.write(tla_template(acceptor_labels, quorum))
-            index += 1
-
-            solution = solution.fork(-1)
-            if not solution.satisfiable():
-                print("No more satisfying instances.")
-                break
-    else:
-        print("No counterexample found. Assertion may be valid.")
-
-
-run(alloy_run_template, create_alloy_config, create_tla_config)
+    nodes = find_field(world, "this/Quorum", "nodes")
+
+    for k, instance in enumerate(solutions(solution), 1):
+        quorum = {}
+        print(f"Instance {k} found. Predicate is consistent.")
+
+        for quorum_index, acceptor_index in relation_indices(instance, nodes):
+            quorum.setdefault(quorum_index, []).append(acceptor_index)
+
+        metadata = {}
+        if dedup:
+            metadata["class"] = canonical_set_family(n, quorum.values())
+        yield k, tla_template(acceptor_labels, quorum), metadata
+
+
+run(alloy_run_template, create_alloy_config, tla_instances, TLA_FILE,
+    COPY_LIST, alloy_partitions, alloy_scopes=alloy_scopes)
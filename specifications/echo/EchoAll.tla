@@ -0,0 +1,150 @@
+------------------------------ MODULE EchoAll ------------------------------
+(***************************************************************************)
+(* The Echo algorithm of module Echo, checked for a whole family of        *)
+(* graphs in a single TLC run. The initiator and neighborhood relation     *)
+(* are taken from Graphs[gid], and gid is chosen in the initial state and  *)
+(* never changes, so every behavior explores exactly one graph.            *)
+(***************************************************************************)
+EXTENDS Naturals, FiniteSets, Relation, TLC
+
+CONSTANTS Node,      \* set of nodes
+          Graphs     \* sequence of records [initiator |-> i, R |-> r]
+
+ASSUME \A g \in DOMAIN Graphs :
+       /\ Graphs[g].initiator \in Node
+       /\ Graphs[g].R \in [Node \X Node -> BOOLEAN]
+       /\ IsIrreflexive(Graphs[g].R, Node)
+       /\ IsSymmetric(Graphs[g].R, Node)
+       /\ IsConnected(Graphs[g].R, Node)
+
+VARIABLE gid  \* index in Graphs of the graph being explored
+
+initiator == Graphs[gid].initiator
+R == Graphs[gid].R
+
+NoNode == CHOOSE x : x \notin Node
+neighbors(n) == { m \in Node : R[m,n] }
+
+\* PlusCal translation of the algorithm in module Echo, extended with gid
+VARIABLES inbox, pc
+
+(* define statement *)
+send(net, p, q, knd) == [net EXCEPT ![q] = @ \cup {[kind |-> knd, sndr |-> p]}]
+
+receive(net, p, msg) == [net EXCEPT ![p] = @ \ {msg}]
+
+multicast(net, p, dest, knd) ==
+  [m \in Node |-> IF m \in dest THEN net[m] \cup {[kind |-> knd, sndr |-> p]}
+                  ELSE net[m]]
+
+VARIABLES parent, children, rcvd, nbrs
+
+vars == << inbox, pc, parent, children, rcvd, nbrs, gid >>
+
+ProcSet == (Node)
+
+Init == (* Choose the graph first, the other variables depend on it *)
+        /\ gid \in DOMAIN Graphs
+        (* Global variables *)
+        /\ inbox = [n \in Node |-> {}]
+        (* Process node *)
+        /\ parent = [self \in Node |-> NoNode]
+        /\ children = [self \in Node |-> {}]
+        /\ rcvd = [self \in Node |-> 0]
+        /\ nbrs = [self \in Node |-> neighbors(self)]
+        /\ pc = [self \in ProcSet |-> "n0"]
+
+n0(self) == /\ pc[self] = "n0"
+            /\ IF self = initiator
+                  THEN /\ inbox' = multicast(inbox, self, nbrs[self], "m")
+                  ELSE /\ TRUE
+                       /\ inbox' = inbox
+            /\ pc' = [pc EXCEPT ![self] = "n1"]
+            /\ UNCHANGED << parent, children, rcvd, nbrs >>
+
+n1(self) == /\ pc[self] = "n1"
+            /\ IF rcvd[self] < Cardinality(nbrs[self])
+                  THEN /\ \E msg \in inbox[self]:
+                            LET net == receive(inbox, self, msg) IN
+                              /\ rcvd' = [rcvd EXCEPT ![self] = rcvd[self]+1]
+                              /\ IF self # initiator /\ rcvd'[self] = 1
+                                    THEN /\ Assert((msg.kind = "m"), 
+                                                   "Failure of assertion at line 55, column 16.")
+                                         /\ parent' = [parent EXCEPT ![self] = msg.sndr]
+                                         /\ inbox' = multicast(net, self, nbrs[self] \ {msg.sndr}, "m")
+                                    ELSE /\ inbox' = net
+                                         /\ UNCHANGED parent
+                              /\ IF msg.kind = "c"
+                                    THEN /\ children' = [children EXCEPT ![self] = children[self] \cup {msg.sndr}]
+                                    ELSE /\ TRUE
+                                         /\ UNCHANGED children
+                       /\ pc' = [pc EXCEPT ![self] = "n1"]
+                  ELSE /\ pc' = [pc EXCEPT ![self] = "n2"]
+                       /\ UNCHANGED << inbox, parent, children, rcvd >>
+            /\ nbrs' = nbrs
+
+n2(self) == /\ pc[self] = "n2"
+            /\ IF self # initiator
+                  THEN /\ Assert((parent[self] \in nbrs[self]), 
+                                 "Failure of assertion at line 70, column 10.")
+                       /\ inbox' = send(inbox, self, parent[self], "c")
+                  ELSE /\ TRUE
+                       /\ inbox' = inbox
+            /\ pc' = [pc EXCEPT ![self] = "Done"]
+            /\ UNCHANGED << parent, children, rcvd, nbrs >>
+
+node(self) == n0(self) \/ n1(self) \/ n2(self)
+
+(* Allow infinite stuttering to prevent deadlock on termination. *)
+Terminating == /\ \A self \in ProcSet: pc[self] = "Done"
+               /\ UNCHANGED vars
+
+Next == /\ \/ (\E self \in Node: node(self))
+           \/ Terminating
+        /\ UNCHANGED gid
+
+Spec == Init /\ [][Next]_vars
+
+Termination == <>(\A self \in ProcSet: pc[self] = "Done")
+
+(***************************************************************************)
+(* Correctness properties.                                                 *)
+(***************************************************************************)
+TypeOK ==
+  /\ gid \in DOMAIN Graphs
+  /\ parent \in [Node -> (Node \cup {NoNode})]
+  /\ children \in [Node -> SUBSET Node]
+  /\ rcvd \in [Node -> Nat]
+  /\ nbrs \in [Node -> SUBSET Node]
+  /\ \A n \in Node : nbrs[n] = neighbors(n) /\ rcvd[n] <= Cardinality(nbrs[n])
+  /\ inbox \in [Node -> SUBSET [kind : {"m","c"}, sndr : Node]]
+  /\ \A n \in Node : \A msg \in inbox[n] : msg.sndr \in nbrs[n]
+
+
+(* The initiator never has a parent *)
+InitiatorNoParent == parent[initiator] = NoNode
+
+(* If a node has a parent, it is a neighbor node *)
+ParentIsNeighbor == \A n \in Node : parent[n] \in neighbors(n) \cup {NoNode}
+
+(* A node n is a child of node m only if m is the parent of n.
+   At the end of the computation, this is "if and only if". *)
+ParentChild == \A m,n \in Node :
+  /\ n \in children[m] => m = parent[n]
+  /\ m = parent[n] /\ pc[m] = "Done" => n \in children[m]
+
+(* Compute the ancestor relation *)
+IsParent == [m,n \in Node |-> n = parent[m]]
+IsAncestor == TransitiveClosure(IsParent, Node)
+
+(* At the end of the computation, the initiator is an ancestor of every other node
+   and the ancestor relation is acyclic.
+   Beware: evaluating this property over any but tiny graphs is costly.
+*)
+AncestorProperties ==
+  (\A n \in Node : pc[n] = "Done")
+  => LET anc == IsAncestor
+     IN  /\ \A n \in Node \ {initiator} : anc[n, initiator]
+         /\ IsIrreflexive(anc, Node)
+
+=============================================================================
@@ -3,14 +3,26 @@
 
 import sys
 import os
-import re
+import json
+import shutil
 
 sys.path.append(os.path.abspath("../../benchmark_scripts"))
-from alloy_to_tla_config import edges_to_string, list_to_quoted_string, create_config_subdirectory, change_block_scope, run
+from alloy_to_tla_config import edges_to_string, list_to_quoted_string, change_block_scope, solutions, canonical_graph, find_field, relation_indices, load_classes, get_object_index, run
 
 
 def alloy_run_template(n):
-    return f"run {{}} for exactly {n} Node"
+    # Enough Int bitwidth for the degree counts in alloy_partitions
+    return f"run {{}} for exactly {n} Node, {n.bit_length() + 1} Int"
+
+
+def alloy_scopes(n):
+    return {"Node": (n, True)}
+
+
+def alloy_partitions(n):
+    # The initiator's degree does not depend on atom names, so every
+    # graph lands in exactly one partition
+    return [f"#Initiator.neighbors = {d}" for d in range(n)]
 
 
 def alloy_template(src, n):
@@ -36,6 +48,22 @@ TestSpec == PrintT(R) /\ PrintT(initiator) /\ Spec
 '''
 
 
+def tla_all_template(N, graphs):
+    records = ",\n".join(f'''[initiator |-> "{I}", R |-> (
+{edges_to_string(N, R)}
+)]''' for I, R in graphs)
+    return rf'''---------- MODULE MCEchoAll ----------
+EXTENDS EchoAll
+
+N1 == {{{list_to_quoted_string(N)}}}
+
+G1 == <<
+{records}
+>>
+===================================
+'''
+
+
 def create_alloy_config(config_dir_prefix, alloy_file_path, alloy_file_name,
                         n):
     dst_path = os.path.join(config_dir_prefix, f"{alloy_file_name}.als")
@@ -44,56 +72,52 @@ def create_alloy_config(config_dir_prefix, alloy_file_path, alloy_file_name,
             dst.write(alloy_template(src.read(), n))
 
 
-def create_tla_config(config_dir_prefix, world, solution, n):
-    tla_config_file = "MCEcho.tla"
-    copy_list = ["Echo.tla", "Relation.tla", "MCEcho.cfg"]
+TLA_FILE = "MCEcho.tla"
+COPY_LIST = ["Echo.tla", "Relation.tla", "MCEcho.cfg"]
+
+
+def tla_instances(world, solution, n, dedup):
     node_labels = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"][:n]
 
-    node_graph = []
-    # initiator = None
-
-    index = 1
-    if solution.satisfiable():
-        while True:
-            print(f"Instance {index} found. Predicate is consistent.")
-
-            for sig in world.getAllReachableSigs():
-                # if str(sig) == "this/Initiator":
-                #     ts = solution.eval(sig)
-                #     for t in ts:
-                #         initiator = int(re.search(r'.*?(\d+)$', str(t)).group(1))
-                if str(sig) == "this/Node":
-                    fields = sig.getFields()
-                    for field in fields:
-                        if str(field.sig
-                               ) == "this/Node" and field.label == "neighbors":
-                            ts = solution.eval(field)
-                            for t in ts:
-                                from_index = int(
-                                    re.search(r'.*?(\d+)$',
-                                              str(t.atom(0))).group(1))
-                                to_index = int(
-                                    re.search(r'.*?(\d+)$',
-                                              str(t.atom(1))).group(1))
-                                node_graph.append((from_index, to_index))
-
-            for initiator in node_labels:
-                config_dir = create_config_subdirectory(
-                    config_dir_prefix, index, copy_list)
-                print(f"Created config directory: {config_dir}")
-
-                output_filename = os.path.join(config_dir,
-                                               f"{tla_config_file}")
-                with open(output_filename, 'w') as f:
-                    f.write(tla_template(node_labels, initiator, node_graph))
-                index += 1
-
-            solution = solution.fork(-1)
-            if not solution.satisfiable():
-                print("No more satisfying instances.")
-                break
-    else:
-        print("No counterexample found. Assertion may be valid.")
-
-
-run(alloy_run_template, create_alloy_config, create_tla_config)
+    neighbors = find_field(world, "this/Node", "neighbors")
+
+    for k, instance in enumerate(solutions(solution), 1):
+        print(f"Instance {k} found. Predicate is consistent.")
+        node_graph = relation_indices(instance, neighbors)
+
+        # Every graph gives one config per choice of initiator
+        for i, initiator in enumerate(node_labels):
+            metadata = {"initiator": initiator, "edges": node_graph}
+            if dedup:
+                metadata["class"] = canonical_graph(n, node_graph, i)
+            yield (f"{k}/{initiator}",
+                   tla_template(node_labels, initiator, node_graph), metadata)
+
+
+def create_single_run(config_dir_prefix, n):
+    """Combine every generated config into one EchoAll model.
+
+    gid k of the model is the k-th config directory, as listed in
+    graphs.json, so a single TLC run covers all of them.
+    """
+    node_labels = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"][:n]
+    classes = load_classes(config_dir_prefix)
+    config_names = sorted(classes, key=get_object_index)
+    graphs = [(classes[name]["metadata"]["initiator"],
+               [tuple(e) for e in classes[name]["metadata"]["edges"]])
+              for name in config_names]
+
+    single_run_dir = os.path.join(config_dir_prefix, "single_run")
+    os.makedirs(single_run_dir, exist_ok=True)
+    for item in ["EchoAll.tla", "Relation.tla", "MCEchoAll.cfg"]:
+        shutil.copy2(item, os.path.join(single_run_dir, item))
+    with open(os.path.join(single_run_dir, "MCEchoAll.tla"), "w") as f:
+        f.write(tla_all_template(node_labels, graphs))
+    with open(os.path.join(single_run_dir, "graphs.json"), "w") as f:
+        json.dump(config_names, f, indent=2)
+    print(f"Created single-run model over {len(graphs)} configs: "
+          f"{single_run_dir}")
+
+
+run(alloy_run_template, create_alloy_config, tla_instances, TLA_FILE,
+    COPY_LIST, alloy_partitions, create_single_run, alloy_scopes)
@@ -6,13 +6,17 @@ import os
 import re
 
 sys.path.append(os.path.abspath("../../benchmark_scripts"))
-from alloy_to_tla_config import edges_to_string, list_to_unquoted_string, create_config_subdirectory, change_block_scope, run
+from alloy_to_tla_config import edges_to_string, list_to_unquoted_string, change_block_scope, run
 
 
 def alloy_run_template(n):
     return f"run {{}} for exactly {n} RM"
 
 
+def alloy_scopes(n):
+    return {"RM": (n, True)}
+
+
 def alloy_template(src, n):
     return change_block_scope(src, "TCConsistent",
                               f"for exactly {n} RM, 1..steps")
@@ -35,19 +39,16 @@ def create_alloy_config(config_dir_prefix, alloy_file_path, alloy_file_name,
             dst.write(alloy_template(src.read(), n))
 
 
-def create_tla_config(config_dir_prefix, world, solution, n):
-    tla_config_file = "TCommit.cfg"
-    copy_list = ["TCommit.tla"]
+TLA_FILE = "TCommit.cfg"
+COPY_LIST = ["TCommit.tla"]
 
-    R = ["r1", "r2", "r3", "r4", "r5", "r6", "r7", "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15", "r16", "r17", "r18", "r19", "r20"][:n]
 
-    config_dir = create_config_subdirectory(config_dir_prefix, 1,
-                                            copy_list)
-    print(f"Created config directory: {config_dir}")
+def tla_instances(world, solution, n, dedup):
+    R = ["r1", "r2", "r3", "r4", "r5", "r6", "r7", "r8", "r9", "r10", "r11", "r12", "r13", "r14", "r15", "r16", "r17", "r18", "r19", "r20"][:n]
 
-    output_filename = os.path.join(config_dir, f"{tla_config_file}")
-    with open(output_filename, 'w') as f:
-        f.write(tla_template(R))
+    # The TLA+ spec is parameterized by N alone: one config for all instances
+    yield 1, tla_template(R), {}
 
 
-run(alloy_run_template, create_alloy_config, create_tla_config)
+run(alloy_run_template, create_alloy_config, tla_instances, TLA_FILE,
+    COPY_LIST, alloy_scopes=alloy_scopes)